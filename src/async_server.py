@@ -0,0 +1,110 @@
+import asyncio, threading
+
+from server import Server
+from models.constants import MAX_WORKERS, MAX_PENDING_REQUESTS
+
+class ServerProtocol(asyncio.DatagramProtocol):
+    """
+    Datagram protocol receiving client requests on the event loop and passing them to the server.
+    """
+
+    def __init__(self, server):
+        self.server = server
+
+    def connection_made(self, transport):
+        self.server.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        self.server._dispatch_request(data, addr)
+
+    def error_received(self, exc):
+        self.server.print_log('ERROR: {}'.format(exc))
+
+
+class AsyncServer(Server):
+
+    def __init__(self, host, port, max_workers: int = MAX_WORKERS, max_pending: int = MAX_PENDING_REQUESTS, **options):
+        """
+        Initializes the asyncio server. Requests are received by an `asyncio.DatagramProtocol` on a single
+        thread and only the database work (`register`, `publish`, `search_file`...) runs on the worker pool.
+        Requests received while `max_pending` requests are in progress are dropped, the client will retry.
+        Other `options` are the same as for `Server`.
+        """
+
+        super().__init__(host, port, max_workers, max_pending, **options)
+        self.max_pending = max_pending
+        self.pending_count = 0
+        self.loop = None
+        self.transport = None
+        self.stop_event = None
+        self.stopped = threading.Event()
+
+    def start_server(self):
+        """
+        Run the event loop until `stop_server` is called.
+        """
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        self.print_log('Starting Server...')
+        self.server_socket.bind((self.host, self.port))
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+
+        await self.loop.create_datagram_endpoint(lambda: ServerProtocol(self), sock=self.server_socket)
+        self.running.set()
+        self.print_log('Server is listening on {}:{}'.format(self.host, self.port))
+
+        try:
+            await self.stop_event.wait()
+            self.running.clear()
+            while (self.pending_count > 0): # Drain requests already being handled
+                await asyncio.sleep(0.01)
+        finally:
+            self.transport.close()
+            self.stopped.set()
+
+    def stop_server(self):
+        """
+        Stop reading new requests, wait for requests already being handled to be
+        responded to and stop the event loop.
+        """
+        self.print_log('Server is shutting down...')
+        if (self.running.is_set()):
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+            self.stopped.wait()
+        else:
+            self.server_socket.close()
+        self.executor.shutdown(wait=True)
+        self.print_log('Request cache {}'.format(self.request_cache.stats()))
+
+    def _dispatch_request(self, request: bytes, client_addr):
+        """
+        Submit the request to the worker pool and send the response from the event loop once it is done.
+        """
+
+        if (not self.running.is_set()):
+            return
+
+        if (self.pending_count >= self.max_pending):
+            self.print_log('Server busy, dropping request from {}:{}'.format(client_addr[0], client_addr[1]))
+            return
+
+        self.pending_count += 1
+        future = self.loop.run_in_executor(self.executor, self.process_request, request, client_addr)
+        future.add_done_callback(lambda future: self._send_response(future, client_addr))
+
+    def _send_response(self, future, client_addr):
+        self.pending_count -= 1
+
+        if (future.exception() is not None):
+            self.print_log('ERROR: {}'.format(future.exception()))
+            return
+
+        rq_num, response = future.result()
+        if (response is None):
+            self.print_log('Ignoring request RQ# {} from {}'.format(rq_num, client_addr[0]))
+            return
+
+        self.transport.sendto(response, client_addr)
+        self.print_log('Responding to request RQ# {} from {}'.format(rq_num, client_addr[0]))
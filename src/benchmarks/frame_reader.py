@@ -0,0 +1,100 @@
+"""
+Benchmark of the messages and raw bytes received on a TCP connection with `FrameReader`, against a `recv` of the header
+and a `recv` of the body of each message, for small and large chunks. Run from the `src` folder:
+
+    python -m benchmarks.frame_reader
+"""
+import socket, multiprocessing, time
+
+from frame_reader import FrameReader
+from message import message as msg_lib
+from models.constants import HEADER_SIZE, STREAM_BUFFER_SIZE
+
+CHUNK_SIZES = [200, 4 * 1024, 64 * 1024, 1024 * 1024]
+TRANSFER_SIZE = 32 * 1024 * 1024 # Bytes of chunks sent for each chunk size
+
+
+def send_all(sock: socket.socket, receiver: socket.socket, data: bytes, count: int):
+    receiver.close() # Only the receiving process keeps the other end open, so it is closed if the receiver fails
+    try:
+        for _ in range(count):
+            sock.sendall(data)
+        sock.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass # Receiver failed and closed the connection
+
+
+def receive_messages_recv(sock: socket.socket, count: int) -> int:
+    """Receive messages with one `recv` of the header and one of the body, as peers did before `FrameReader`."""
+    for received in range(count):
+        data = sock.recv(HEADER_SIZE)
+        _, header = msg_lib.parse_header(data)
+        data = sock.recv(header['content-length'])
+        msg_lib.parse_body(data)
+    return count
+
+
+def receive_messages_reader(sock: socket.socket, count: int) -> int:
+    reader = FrameReader(sock)
+    for received in range(count):
+        reader.read_message()
+    return count
+
+
+def receive_bytes_recv(sock: socket.socket, size: int) -> int:
+    remaining = size
+    while (remaining > 0):
+        data = sock.recv(min(remaining, STREAM_BUFFER_SIZE))
+        if (not data):
+            break
+        remaining -= len(data)
+    return size - remaining
+
+
+def receive_bytes_reader(sock: socket.socket, size: int) -> int:
+    reader = FrameReader(sock)
+    remaining = size
+    while (remaining > 0):
+        remaining -= len(reader.read_bytes(remaining))
+    return size - remaining
+
+
+def run(receive, data: bytes, count: int, amount: int):
+    """Returns the seconds taken to receive `count` times `data` with `receive`, or the error raised."""
+    sender, receiver = socket.socketpair()
+    sender_process = multiprocessing.Process(target=send_all, args=(sender, receiver, data, count)) # Sent without holding this process' GIL
+    start = time.perf_counter()
+    sender_process.start()
+    sender.close()
+    try:
+        receive(receiver, amount)
+        return time.perf_counter() - start
+    except Exception as err:
+        return err
+    finally:
+        receiver.close()
+        sender_process.join()
+
+
+def report(name: str, chunk_size: int, result, transfer_size: int, count: int):
+    if (isinstance(result, Exception)):
+        print('{:<22} {:>8} B  failed: {!r}'.format(name, chunk_size, result))
+    else:
+        print('{:<22} {:>8} B  {:>8.1f} MB/s  {:>10.0f} chunks/s'.format(
+            name, chunk_size, transfer_size / result / 1e6, count / result))
+
+
+def main():
+    for chunk_size in CHUNK_SIZES:
+        count = TRANSFER_SIZE // chunk_size
+        message = msg_lib.create_request('FILE', {'RQ#': 0, 'FILE_NAME': 'benchmark', 'CHUNK#': 0, 'TEXT': 'x' * chunk_size})
+        report('messages recv', chunk_size, run(receive_messages_recv, message, count, count), TRANSFER_SIZE, count)
+        report('messages FrameReader', chunk_size, run(receive_messages_reader, message, count, count), TRANSFER_SIZE, count)
+
+        chunk = bytes(chunk_size)
+        report('bytes recv', chunk_size, run(receive_bytes_recv, chunk, count, count * chunk_size), TRANSFER_SIZE, count)
+        report('bytes FrameReader', chunk_size, run(receive_bytes_reader, chunk, count, count * chunk_size), TRANSFER_SIZE, count)
+
+
+if __name__ == '__main__':
+    main()
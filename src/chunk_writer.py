@@ -0,0 +1,53 @@
+import os
+
+from models.constants import CHUNK_FILE_SUFFIX, CHUNK_REORDER_WINDOW
+
+
+class ChunkWriter():
+    """
+    Writes the chunks of a `CHUNK` mode download to a temporary file as they are received. Chunks are written in order,
+    a chunk received ahead of the next one to write is kept until the chunks before it are received, at most `window`
+    chunks ahead. The file is renamed to `path` once every chunk up to the last one is written, see `commit`.
+    """
+
+    def __init__(self, path: str, window: int = CHUNK_REORDER_WINDOW):
+        self.path = path
+        self.window = window
+        self.file = open(path + CHUNK_FILE_SUFFIX, 'w')
+        self.next_chunk = 0 # Chunks before it are written
+        self.last_chunk = None # Chunk# of FILE-END once received
+        self.pending = {} # Chunk# -> text of chunks received ahead of the next chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type_, value, traceback):
+        self.close()
+
+    def add(self, chunk_num: int, text: str, last: bool = False) -> None:
+        """Write a chunk, or keep it until the chunks before it are written. Duplicate chunks are ignored."""
+        if (chunk_num < self.next_chunk or chunk_num in self.pending):
+            return
+        if (chunk_num >= self.next_chunk + self.window):
+            raise ValueError('Chunk # {} received too far ahead of chunk # {}'.format(chunk_num, self.next_chunk))
+        if (last):
+            self.last_chunk = chunk_num
+
+        self.pending[chunk_num] = text
+        while (self.next_chunk in self.pending):
+            self.file.write(self.pending.pop(self.next_chunk))
+            self.next_chunk += 1
+
+    def is_complete(self) -> bool:
+        return self.last_chunk is not None and self.next_chunk > self.last_chunk
+
+    def commit(self) -> None:
+        """Close the temporary file and rename it to the downloaded file, replacing it if it exists."""
+        self.file.close()
+        os.replace(self.path + CHUNK_FILE_SUFFIX, self.path)
+
+    def close(self) -> None:
+        """Delete the temporary file if the download is not committed."""
+        if (not self.file.closed):
+            self.file.close()
+            os.remove(self.path + CHUNK_FILE_SUFFIX)
@@ -1,45 +1,76 @@
-import socket, threading, os, json
+import socket, threading, os, sys, io, json, argparse, signal, time
+from collections import Counter
 from random import randint
 from datetime import datetime
-import tkinter as tk
-from tkinter.constants import DISABLED, NORMAL, RIGHT, Y
 
 from message import message as msg_lib
-from models.constants import BUFFER_SIZE, FORMAT, HEADER_SIZE
+from file_index import FileIndex, chunk_hasher, hash_chunk, hash_root
+from frame_reader import FrameReader
+from upload_server import UploadServer
+from chunk_writer import ChunkWriter
+from range_scheduler import RangeScheduler
+from response_cache import ResponseCache
+from udp_transport import UdpTransport
+from compression import create_decompressor
+from models.constants import BUFFER_SIZE, SEARCH_MODES, TEXT_CONTENT_TYPE, BINARY_CONTENT_TYPE, \
+    PUBLIC_FOLDER, TRANSFER_MODES, PARTIAL_FILE_SUFFIX, PROGRESS_FILE_SUFFIX, CHUNK_FILE_SUFFIX, PROGRESS_SAVE_INTERVAL, PROGRESS_SAVE_PERIOD, \
+    HASH_CHUNK_SIZE, MAX_VERIFY_ATTEMPTS, SWARM_RANGE_SIZE, SWARM_MAX_PEERS, SWARM_MAX_PEER_FAILURES, SWARM_TIMEOUT, \
+    UPLOAD_BACKLOG, MAX_UPLOADS, UPLOAD_QUEUE_SIZE, UPLOAD_RATE, UPLOAD_CONNECTION_RATE, COMPRESSION_CODECS, COMPRESSION_LEVEL, \
+    STREAM_BUFFER_SIZE, CLIENT_CACHE_TTL, CACHED_STATUSES, UDP_MAX_IN_FLIGHT, UDP_MAX_RETRIES, UDP_REQUEST_DEADLINE
 
 class Client:
-    def __init__(self):
+    def __init__(self, content_type: str = TEXT_CONTENT_TYPE, upload_backlog: int = UPLOAD_BACKLOG, max_uploads: int = MAX_UPLOADS,
+                 upload_queue_size: int = UPLOAD_QUEUE_SIZE, upload_rate: int = UPLOAD_RATE, connection_rate: int = UPLOAD_CONNECTION_RATE,
+                 compression_level: int = COMPRESSION_LEVEL, cache_ttl: float = CLIENT_CACHE_TTL, max_in_flight: int = UDP_MAX_IN_FLIGHT,
+                 max_retries: int = UDP_MAX_RETRIES, request_deadline: float = UDP_REQUEST_DEADLINE, host: str = None,
+                 tcp_port: int = None, log_stream=sys.stdout):
         """
-        Initializes the client by starting the GUI and TCP listening socket.
-        The TCP listening port will be used to accept incoming download requests.
+        Initializes the client by starting the TCP listening socket. The client has no user interface, each request is sent
+        on the calling thread and returns the response, see `ClientGui` for the GUI and `main` for the command line.
+        The TCP listening port will be used to accept incoming download requests, it is bound to `host` and `tcp_port`,
+        by default the PC's current IP and a random port. At most `max_uploads` are sent
+        at the same time and `upload_queue_size` more wait for them. The downloads sent are limited to `upload_rate`
+        bytes per second in total and `connection_rate` bytes per second each, 0 for no limit, and compressed at `compression_level`.
+        Requests to the server are sent with the text or binary header depending on `content_type`,
+        the server responds with the same one. The hashes of the files in public folder are kept up to date on a background thread.
+        If `cache_ttl` is set, the responses to lookups are kept for `cache_ttl` seconds, see `send_lookup`.
+        At most `max_in_flight` requests to the server wait for their response at the same time, a request is sent again
+        at most `max_retries` times and given up `request_deadline` seconds after it is first sent.
+        Logs are printed to `log_stream`, None to not print them.
         """
 
-        # Lock to ensure UI is built before client can begin running
-        self.start_ui_lock = threading.Lock()
-        
-        self.start_ui_lock.acquire()
-        gui_thread = threading.Thread(target=self.gui)
-        gui_thread.start()
-        
+        self.log_stream = log_stream
         self.client_name = ''
         self.rq_num = -1
-        self.host = socket.gethostbyname(socket.gethostname()) # Get PC's current IP
+        self.rq_lock = threading.Lock()
+        self.content_type = content_type
+        self.response_cache = ResponseCache(cache_ttl) if cache_ttl > 0 else None
+        self.host = host if host is not None else socket.gethostbyname(socket.gethostname()) # Get PC's current IP
         self.tcp_port = 10000
+        self.server_addr = None
+        self.downloads = {} # Progress and partial file of the streamed downloads running, saved if the client stops
+        self.downloads_lock = threading.Lock()
 
         self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) # UDP Socket
+        self.udp_transport = UdpTransport(self.udp_socket, max_in_flight, max_retries, request_deadline)
         self.tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM) # TCP Socket
 
-        self.get_tcp_port_num() # Get random TCP port number
-        self.start_ui_lock.acquire()
+        self.file_index = FileIndex()
+        self.file_index.start()
+        self.upload_server = UploadServer(self.tcp_socket, self.file_index, self.print_log, upload_backlog, max_uploads, upload_queue_size,
+                                          upload_rate, connection_rate, compression_level=compression_level)
+
+        self.bind_tcp_socket(tcp_port)
         client_listening_thread = threading.Thread(target=self.start_tcp_server, args=(), daemon=True)
         client_listening_thread.start()
 
     def get_rq_num(self):
         """
-        Increment RQ# by 1. Returns new RQ#.
+        Increment RQ# by 1. Returns new RQ#. Requests are sent from several threads, each must get its own RQ#.
         """
-        self.rq_num += 1
-        return self.rq_num
+        with self.rq_lock:
+            self.rq_num += 1
+            return self.rq_num
 
     def get_tcp_port_num(self):
         """
@@ -49,185 +80,224 @@ class Client:
 
     def print_log(self, msg: str):
         """
-        Attaches timestamp to message and prints to GUI & terminal.
+        Attaches timestamp to message and prints to terminal. Returns the message printed.
         """
         date_time = datetime.now().strftime(("%Y-%m-%d %H:%M:%S"))
         log  = '[{}] {}'.format(date_time, msg)
-        self.insert_log(log)
-        print(log)
+        if (self.log_stream is not None):
+            print(log, file=self.log_stream, flush=True)
+        return log
 
-    def start_tcp_server(self):
+    def bind_tcp_socket(self, tcp_port: int = None):
         """
-        Infinite loop to listen for incoming download requests from other clients.
-        Listening buffer set to 5. Each request is handled on a new thread.
+        Bind client listening port before any request is sent, so the port registered is the one listening.
+        If no port is given a random one is used, if bind fails a new port number is generated.
         """
 
-        # Try to bind client listening port, if bind fails generate a new port number
         self.print_log('Starting Client...')
+        if (tcp_port is not None):
+            self.tcp_port = tcp_port
+            self.tcp_socket.bind((self.host, self.tcp_port))
+            return
+
         is_bound = False
         while (not is_bound):
             try:
+                self.get_tcp_port_num() # Get random TCP port number
                 self.tcp_socket.bind((self.host, self.tcp_port))
                 is_bound = True
 
             except OSError:
-                self.get_tcp_port_num()
+                pass
 
-        self.print_log('Client is listening on {}:{}'.format(self.host, self.tcp_port))
-        self.tcp_socket.listen(5)
+    def start_tcp_server(self):
+        """
+        Infinite loop to listen for incoming download requests from other clients.
+        All requests are handled by the upload server on this thread, see `UploadServer`.
+        """
 
-        while (True):
-            client_socket, addr = self.tcp_socket.accept()
-            new_client_thread = threading.Thread(target=self.handle_download_request, args=(client_socket, addr), daemon=True)
-            new_client_thread.start()
+        self.print_log('Client is listening on {}:{}'.format(self.host, self.tcp_port))
+        self.upload_server.serve_forever()
 
     def stop_client(self):
         """
-        Close client's UDP and TCP sockets.
+        Save the progress of the downloads running and close client's UDP and TCP sockets.
         """
         self.print_log('Client is shutting down...')
+        self.save_downloads()
+        self.file_index.stop()
+        self.upload_server.stop()
+        self.udp_transport.stop()
         self.udp_socket.close()
         self.tcp_socket.close()
 
-    def handle_download_request(self, client_socket: socket.socket, addr):
+    def set_upload_limits(self, upload_rate: int, connection_rate: int):
         """
-        Handle client's download request. Function will read the download file name from the request and read file in public folder.
-        Chunks of 200 characters are read and sent to the client until the end of file is reached. A special `FILE-END` response is sent 
-        to identify the end of file is reached. If file doesn't exist respond with `DOWNLOAD-ERROR`.
+        Change the limits of the downloads sent to other clients, in bytes per second, while they are being sent.
+        A limit of 0 removes it.
         """
 
-        self.print_log('New connection from {}:{}'.format(addr[0], addr[1]))
-
-        try:
-            data = client_socket.recv(HEADER_SIZE).decode(FORMAT)
-            header = msg_lib.extract_headers(data)
-            content_length = header['content-length']
-
-            data = client_socket.recv(content_length).decode(FORMAT)
-            body = json.loads(data)
-            self.print_log('Client Request\nHeader: {}\nBody: {}\n'.format(header, body))
-
-        except OSError as err:
-            self.print_log('ERROR: {}'.format(err))
-            return
-
-        self.print_log('Starting download...')
-        chunk_num = 0
-        file_name = body['FILE_NAME']
-        path = os.path.join('..\public', file_name)
-        self.print_log('Reading file from {}'.format(path))
-        
-        try:
-            with open(path, 'r') as file:
-                while (True):
-                    chunk = file.read(200)
-
-                    payload = {
-                        'RQ#': body['RQ#'],
-                        'FILE_NAME': file_name,
-                        'CHUNK#': chunk_num,
-                        'TEXT': chunk
-                    }
-
-                    if (len(chunk) < 200 or not chunk): # Check for EOF
-                        self.print_log('Sending final chunk # {}'.format(chunk_num))
-                        response = msg_lib.create_request('FILE-END', payload)
-                        client_socket.send(response)
-                        break
+        self.upload_server.configure(rate=upload_rate, connection_rate=connection_rate)
+        self.print_log('Upload limited to {} in total and {} per download'.format(
+            '{} KiB/s'.format(upload_rate // 1024) if upload_rate else 'no limit',
+            '{} KiB/s'.format(connection_rate // 1024) if connection_rate else 'no limit'))
 
-                    else:
-                        self.print_log('Sending chunk # {}'.format(chunk_num))
-                        response = msg_lib.create_request('FILE', payload)
-                        client_socket.send(response)
-                        chunk_num += 1
-            
-            self.print_log('Download complete')
-
-        except Exception as err:
-            self.print_log('Download Error\nReason: {}'.format(err))
-            payload = {
-                'STATUS': 'DOWNLOAD-ERROR',
-                'RQ#': body['RQ#'],
-                'REASON': str(err)
-            }
-            response = msg_lib.create_response(payload, 500)
-            client_socket.send(response)
+    def upload_stats(self):
+        """
+        Print the bytes sent to each other client and the number of downloads being sent and waiting. Returns them.
+        """
+        stats = self.upload_server.stats()
+        self.print_log('Uploads: {} being sent, {} waiting'.format(stats['UPLOADS'], stats['QUEUED']))
+        for peer, bytes_sent in sorted(stats['BYTES_SENT'].items()):
+            self.print_log('{} bytes sent to {}'.format(bytes_sent, peer))
+        return stats
 
     def connect_to_server(self, host: str, port: str):
         """
-        Save server's ip address and port number in memory.
+        Save server's ip address and port number in memory. Returns True if they are valid.
         """
 
+        port = str(port)
+
         if (host == ''):
             self.print_log("Host cannot be empty")
-            return
+            return False
         elif (port == ''):
             self.print_log("Port number cannot be empty")
-            return  
+            return False
         elif (not port.isdecimal()):
             self.print_log("Port number needs to be an integer value")
-            return
+            return False
         else:
             port = int(port)
 
         self.server_addr = (host, port)
         self.print_log('Connected to server {}:{}'.format(host, port))
-        # self.button_toggle("server")
-        self.button_toggle("enable")
+        return True
 
     def send_to_udp_server(self, current_rq_num: int, request: bytes):
         """
-        Send requests to server. All requests will retry 3 times if the connection times out or will stop trying if the server is unavailable.
-        All responses not related to the current client's RQ# are ignored.
+        Send requests to server. Requests are sent again after a timeout adapted to the round trips measured to the server, until their
+        retries or deadline are exhausted, or will stop trying if the server is unavailable. Responses are routed to their request by RQ#, several requests can wait for their response at the same time, see `UdpTransport`.
+        Returns the body of the response, None if there is no response.
         """
 
+        if (self.server_addr is None):
+            self.print_log('ERROR : Not connected to a server')
+            return
+        if (len(request) > BUFFER_SIZE):
+            self.print_log('ERROR : Request is larger than {} bytes, the server cannot read it'.format(BUFFER_SIZE))
+            return
+
         try:
-            self.udp_socket.sendto(request, self.server_addr)
+            body = self.udp_transport.request(current_rq_num, request, self.server_addr,
+                                              on_retry=lambda: self.print_log('Connection timeout. Sending again...'))
 
         except OSError:
             self.print_log('ERROR : Server is unavailable')
-            self.button_toggle("enable")
             return
 
-        self.udp_socket.settimeout(5)
+        if (body is None):
+            self.print_log('No response from the server')
+            return
+
+        self.print_log('Server Response\n{}\n'.format(json.dumps(body, indent=2)))
+        if('STATUS' in body):
+            # Don't save client's name if register or update fails or if de-register is successful
+            if (body['STATUS'] == 'REGISTER-DENIED' or body['STATUS'] == 'DE-REGISTERED' or body['STATUS'] == 'UPDATE-DENIED'):
+                self.client_name = ''
 
-        for i in range(3):
-            try:
-                while (True):
-                    response = None
-                    response, addr = self.udp_socket.recvfrom(BUFFER_SIZE)
-                    response = response.decode(FORMAT)
-                    body = msg_lib.extract_body(response)
-
-                    if ('RQ#' in body and body['RQ#'] == current_rq_num): # Ignore if response is not for current RQ#
-                        self.print_log('Server Response\n{}\n'.format(response))
-                        if('STATUS' in body):
-                            # Don't save client's name if register or update fails or if de-register is successful
-                            if (body['STATUS'] == 'REGISTER-DENIED' or body['STATUS'] == 'DE-REGISTERED' or body['STATUS'] == 'UPDATE-DENIED'):
-                                self.client_name = ''
-                        
-                        self.button_toggle("enable")
-                        self.display_client_name()
-                        return
-
-            except socket.timeout:
-                self.print_log('Connection timeout. Sending again...')
-                self.udp_socket.sendto(request, self.server_addr)
+        return body
 
-            except ConnectionError:
-                self.print_log('ERROR : Server is unavailable')
-                self.button_toggle("enable")
-                return
+    def send_pages_to_udp_server(self, method: str, payload: dict):
+        """
+        Send a request returning pages (`RETRIEVE-ALL`, `RETRIEVE-INFO` or `SEARCH-FILE`) to server, then request the next page
+        with the `NEXT_CURSOR` of each response until the last page is received. Each page is logged as it arrives.
+        Returns the body of each page received.
+        """
 
-        if response is None:
-            self.print_log('No response from the server')
-            self.button_toggle("enable")
+        pages = []
+        while (True):
+            request = msg_lib.create_request(method, payload, self.content_type)
+            body = self.send_to_udp_server(payload['RQ#'], request)
+            if (body is not None):
+                pages.append(body)
+            if (body is None or body.get('NEXT_CURSOR') is None):
+                return pages
+
+            payload = dict(payload, CURSOR=body['NEXT_CURSOR'])
+            payload['RQ#'] = self.get_rq_num()
+            self.print_log('Sending next page request RQ# {}...'.format(payload['RQ#']))
+
+    def send_registry_change(self, current_rq_num: int, request: bytes):
+        """
+        Send a request changing the registry to server. The response cache is cleared before and once the response is received,
+        so a lookup answered before the change is applied is not kept either.
+        """
+
+        self.invalidate_cache()
+        body = self.send_to_udp_server(current_rq_num, request)
+        self.invalidate_cache()
+        return body
+
+    def send_lookup(self, method: str, payload: dict, key: tuple, use_cache: bool = True):
+        """
+        Send a lookup request (`RETRIEVE-ALL`, `RETRIEVE-INFO` or `SEARCH-FILE`) and the requests of its next pages to server,
+        or answer it from the response cache if the same lookup was answered less than `cache_ttl` seconds ago.
+        Only complete successful responses are kept. Returns the body of each page.
+        """
+
+        if (self.response_cache is None or not use_cache):
+            return self.send_pages_to_udp_server(method, payload)
+
+        pages = self.response_cache.get(key)
+        if (pages is not None):
+            for body in pages:
+                self.print_log('Cached Response\n{}\n'.format(json.dumps(body, indent=2)))
+            return pages
+
+        generation = self.response_cache.generation
+        pages = self.send_pages_to_udp_server(method, payload)
+        if (pages and pages[-1].get('NEXT_CURSOR') is None and all(body.get('STATUS') in CACHED_STATUSES for body in pages)):
+            self.response_cache.put(key, pages, generation)
+        return pages
+
+    def invalidate_cache(self):
+        if (self.response_cache is not None):
+            self.response_cache.invalidate()
+
+    def cache_stats(self):
+        """
+        Print the hits, misses and hit rate of the response cache. Returns them, None if the cache is disabled.
+        """
+        if (self.response_cache is None):
+            self.print_log('Response cache is disabled, start the client with --cache-ttl to enable it')
             return
 
+        stats = self.response_cache.stats()
+        self.print_log('Response cache: {} lookups kept, {} hits, {} misses, {} evictions, {:.0%} hit rate'.format(
+            stats['size'], stats['hits'], stats['misses'], stats['evictions'], stats['hit_rate']))
+        return stats
+
+    def request_stats(self):
+        """
+        Print the requests sent to the server, their retransmissions and the round trip estimates of each server. Returns them.
+        """
+        stats = self.udp_transport.stats()
+        self.print_log('Requests: {} sent, {} answered, {} retransmissions, {} without response'.format(
+            stats['requests'], stats['responses'], stats['retransmissions'], stats['timeouts']))
+        for server, estimate in stats['servers'].items():
+            if (estimate['srtt'] is None):
+                self.print_log('Server {}: no round trip measured, timeout {:.3f} s'.format(server, estimate['rto']))
+            else:
+                self.print_log('Server {}: round trip {:.3f} s +/- {:.3f} s, timeout {:.3f} s'.format(
+                    server, estimate['srtt'], estimate['rttvar'], estimate['rto']))
+        return stats
+
     def register(self, name: str):
         """
         Create payload for register method and send request to server. 
-        Sending request is handled on a new thread.
+        Returns the body of the response, None if there is no response.
         """
 
         if (name == ""):
@@ -238,7 +308,6 @@ class Client:
             self.print_log('A client is still registered')
             return
         
-        self.button_toggle("disable")
         self.client_name = name
         rq_num = self.get_rq_num()
         payload = {
@@ -249,17 +318,15 @@ class Client:
         }
 
         self.print_log('Sending register request RQ# {}...'.format(rq_num))
-        request = msg_lib.create_request('REGISTER', payload)
-        register_thread = threading.Thread(target=self.send_to_udp_server, args=(rq_num, request), daemon=True)
-        register_thread.start()
+        request = msg_lib.create_request('REGISTER', payload, self.content_type)
+        return self.send_registry_change(rq_num, request)
 
     def de_register(self):
         """
         Create payload for de-register method and send request to server. 
-        Sending request is handled on a new thread.
+        Returns the body of the response, None if there is no response.
         """
 
-        self.button_toggle("disable")
         rq_num = self.get_rq_num()
         payload = {
             'RQ#': rq_num,
@@ -267,21 +334,19 @@ class Client:
         }
 
         self.print_log('Sending de-register request RQ# {}...'.format(rq_num))
-        request = msg_lib.create_request('DE-REGISTER', payload)
-        de_register_thread = threading.Thread(target=self.send_to_udp_server, args=(rq_num, request), daemon=True)
-        de_register_thread.start()
+        request = msg_lib.create_request('DE-REGISTER', payload, self.content_type)
+        return self.send_registry_change(rq_num, request)
 
     def publish(self, file_names: str):
         """
-        Create payload for publish method and send request to server. 
-        Sending request is handled on a new thread.
+        Create payload for publish method and send request to server. The hash of each file found in public folder
+        is advertised with it. Returns the body of the response, None if there is no response.
         """
 
         if (file_names == ''):
             self.print_log("File name(s) cannot be empty")
             return
         
-        self.button_toggle("disable")
         files = list(file_name.strip() for file_name in file_names.split(','))
         rq_num = self.get_rq_num()
         payload = {
@@ -290,22 +355,26 @@ class Client:
             'LIST_OF_FILES': files
         }
 
+        return self.handle_publish(rq_num, payload)
+
+    def handle_publish(self, rq_num: int, payload: dict):
+        entries = {file_name: self.file_index.get(file_name) for file_name in payload['LIST_OF_FILES']}
+        payload['HASHES'] = {file_name: entry['HASH'] for file_name, entry in entries.items() if entry is not None}
+
         self.print_log('Sending publish request RQ# {}...'.format(rq_num))
-        request = msg_lib.create_request('PUBLISH', payload)
-        publish_thread = threading.Thread(target=self.send_to_udp_server, args=(rq_num, request), daemon=True)
-        publish_thread.start()
+        request = msg_lib.create_request('PUBLISH', payload, self.content_type)
+        return self.send_registry_change(rq_num, request)
 
     def remove(self, file_names: str):
         """
         Create payload for remove method and send request to server. 
-        Sending request is handled on a new thread.
+        Returns the body of the response, None if there is no response.
         """
 
         if (file_names == ''):
             self.print_log("File name(s) cannot be empty")
             return
         
-        self.button_toggle("disable")
         files = list(file_name.strip() for file_name in file_names.split(','))
         rq_num = self.get_rq_num()
         payload = {
@@ -315,17 +384,15 @@ class Client:
         }
 
         self.print_log('Sending remove request RQ# {}...'.format(rq_num))
-        request = msg_lib.create_request('REMOVE', payload)
-        remove_thread = threading.Thread(target=self.send_to_udp_server, args=(rq_num, request), daemon=True)
-        remove_thread.start()
+        request = msg_lib.create_request('REMOVE', payload, self.content_type)
+        return self.send_registry_change(rq_num, request)
     
-    def retrieve_all(self):
+    def retrieve_all(self, use_cache: bool = True):
         """
-        Create payload for retrieve-all method and send request to server. 
-        Sending request is handled on a new thread.
+        Create payload for retrieve-all method and send request to server. Returns the body of each page, a client
+        with too many files for a single page is continued on the next one. A cached response is used unless `use_cache` is False.
         """
 
-        self.button_toggle("disable")
         rq_num = self.get_rq_num()
         payload = {
             'RQ#':  rq_num,
@@ -333,21 +400,19 @@ class Client:
         }
 
         self.print_log('Sending retrieve all request RQ# {}...'.format(rq_num))
-        request = msg_lib.create_request('RETRIEVE-ALL', payload)
-        retrieve_all_thread = threading.Thread(target=self.send_to_udp_server, args=(rq_num, request), daemon=True)
-        retrieve_all_thread.start()
+        key = ('RETRIEVE-ALL', self.client_name)
+        return self.send_lookup('RETRIEVE-ALL', payload, key, use_cache)
 
-    def retrieve_info(self, search_name: str):
+    def retrieve_info(self, search_name: str, use_cache: bool = True):
         """
-        Create payload for retrieve-info method and send request to server. 
-        Sending request is handled on a new thread.
+        Create payload for retrieve-info method and send request to server. Returns the body of the response, with
+        the files of all its pages, None if there is no response. A cached response is used unless `use_cache` is False.
         """
 
         if (search_name == ""):
             self.print_log("Name cannot be empty")
             return
         
-        self.button_toggle("disable")
         rq_num = self.get_rq_num()
         payload = {
             'RQ#':  rq_num,
@@ -356,44 +421,48 @@ class Client:
         }
 
         self.print_log('Sending retrieve info request RQ# {}...'.format(rq_num))
-        request = msg_lib.create_request('RETRIEVE-INFO', payload)
-        retrieve_info_thread = threading.Thread(target=self.send_to_udp_server, args=(rq_num, request), daemon=True)
-        retrieve_info_thread.start()
+        key = ('RETRIEVE-INFO', self.client_name, search_name)
+        pages = self.send_lookup('RETRIEVE-INFO', payload, key, use_cache)
+        if (len(pages) > 1): # Files too many for a single datagram
+            return dict(pages[-1], LIST_OF_FILES=[file_name for page in pages for file_name in page.get('LIST_OF_FILES', [])])
+        return pages[0] if pages else None
 
-    def search_file(self, file_name: str):
+    def search_file(self, file_name: str, mode: str = 'EXACT', use_cache: bool = True):
         """
         Create payload for search-file method and send request to server. 
-        Sending request is handled on a new thread.
+        Mode is one of `EXACT`, `PREFIX`, `GLOB` (wildcards) or `FULLTEXT` (words in file name).
+        Returns the body of each page, a cached response is used unless `use_cache` is False.
         """
 
         if (file_name == ""):
             self.print_log("File name cannot be empty")
             return
+        elif (mode not in SEARCH_MODES):
+            self.print_log("Search mode needs to be one of {}".format(', '.join(SEARCH_MODES)))
+            return
 
-        self.button_toggle("disable")
         rq_num = self.get_rq_num()
         payload = {
             'RQ#':  rq_num,
             'NAME': self.client_name,
-            'FILE_NAME': file_name
+            'FILE_NAME': file_name,
+            'MODE': mode
         }
 
         self.print_log('Sending search file request RQ# {}...'.format(rq_num))
-        request = msg_lib.create_request('SEARCH-FILE', payload)
-        search_file_thread = threading.Thread(target=self.send_to_udp_server, args=(rq_num, request), daemon=True)
-        search_file_thread.start()
+        key = ('SEARCH-FILE', self.client_name, file_name, mode)
+        return self.send_lookup('SEARCH-FILE', payload, key, use_cache)
 
     def update_contact(self, name: str):
         """
         Create payload for update-contact method and send request to server. 
-        Sending request is handled on a new thread.
+        Returns the body of the response, None if there is no response.
         """
 
         if (name == ""):
             self.print_log("Name cannot be empty")
             return
         
-        self.button_toggle("disable")
         self.client_name = name
         rq_num = self.get_rq_num()
         payload = {
@@ -404,15 +473,37 @@ class Client:
         }
 
         self.print_log('Sending update request RQ# {}...'.format(rq_num))
-        request = msg_lib.create_request('UPDATE-CONTACT', payload)
-        update_contact_thread = threading.Thread(target=self.send_to_udp_server, args=(rq_num, request), daemon=True)
-        update_contact_thread.start()
+        request = msg_lib.create_request('UPDATE-CONTACT', payload, self.content_type)
+        return self.send_registry_change(rq_num, request)
 
-    def download(self, host: str, port: str, file_name: str):
+    def batch(self, requests: list):
         """
-        Validate download request and handle download on a new thread.
+        Send several requests to the server in a single BATCH request, each request is a dict
+        with its `METHOD` and payload without RQ#. The server handles them in a single unit of work.
+        Returns the body of the response, None if there is no response.
         """
 
+        if (not requests):
+            self.print_log("Batch cannot be empty")
+            return
+
+        rq_num = self.get_rq_num()
+        payload = {
+            'RQ#': rq_num,
+            'REQUESTS': requests
+        }
+
+        self.print_log('Sending batch of {} requests RQ# {}...'.format(len(requests), rq_num))
+        request = msg_lib.create_request('BATCH', payload, self.content_type)
+        return self.send_registry_change(rq_num, request)
+
+    def download(self, host: str, port: str, file_name: str, mode: str = 'STREAM'):
+        """
+        Validate download request and download the file. Returns True if it is downloaded, None if the request is invalid.
+        """
+
+        port = str(port)
+
         if (file_name == ""):
             self.print_log("File name cannot be empty")
             return
@@ -428,15 +519,244 @@ class Client:
         else:
             port = int(port)
 
-        self.button_toggle("disable")
-        download_thread = threading.Thread(target=self.handle_download, args=(host, port, file_name), daemon=True)
-        download_thread.start()
+        if (mode not in TRANSFER_MODES):
+            self.print_log("Transfer mode must be one of {}".format(', '.join(TRANSFER_MODES)))
+            return
+
+        return self.handle_download(host, port, file_name, mode)
 
-    def handle_download(self, host: str, port: str, file_name: str):
+    def swarm_download(self, file_name: str):
+        """
+        Validate swarm download request and download the file. Returns True if it is downloaded, None if the request is invalid.
+        """
+
+        if (file_name == ""):
+            self.print_log("File name cannot be empty")
+            return
+
+        return self.handle_swarm_download(file_name)
+
+    def handle_swarm_download(self, file_name: str):
+        """
+        Search the clients holding the file, then download ranges of the file from several of them at the same time.
+        Each peer downloads the next range left as soon as it is done with the previous one, so faster peers download
+        more ranges, and once every range is started idle peers download the ranges slower peers are still downloading, see `RangeScheduler`.
+        A range which fails, or fails verification against the chunk hashes of the file, is downloaded again,
+        by any peer, and a peer failing too often is not used anymore. Peers advertising another hash of the file are not used.
+        The ranges are written to a partial file in public folder which is renamed once all ranges are received. If the download
+        stops, its progress is saved so it is resumed, by a swarm download or a `STREAM` download. Returns True if the file is downloaded.
+        """
+
+        rq_num = self.get_rq_num()
+        payload = {
+            'RQ#': rq_num,
+            'NAME': self.client_name,
+            'FILE_NAME': file_name
+        }
+
+        self.print_log('Searching peers holding {} RQ# {}...'.format(file_name, rq_num))
+        pages = self.send_lookup('SEARCH-FILE', payload, ('SEARCH-FILE', self.client_name, file_name, 'EXACT'))
+        holders = {(client['IP_ADDRESS'], client['TCP_SOCKET']): client.get('HASH') for page in pages
+            for client in page.get('CLIENTS', []) if client['NAME'] != self.client_name}
+        peers = list(holders)[:SWARM_MAX_PEERS]
+
+        path = os.path.join(PUBLIC_FOLDER, file_name)
+        ranges = None
+        try:
+            if (not peers):
+                raise ConnectionError('No other client holds {}'.format(file_name))
+
+            # Download the version of the file advertised by most peers, its chunk hashes are sent by one of them
+            advertised_hashes = Counter(file_hash for file_hash in holders.values() if file_hash is not None)
+            file_hash = advertised_hashes.most_common(1)[0][0] if advertised_hashes else None
+            peers = [peer for peer in peers if holders[peer] in (None, file_hash)]
+            peers.sort(key=lambda peer: holders[peer] is None) # Chunk hashes are requested from a peer advertising the hash first
+            failures = {peer: 0 for peer in peers}
+
+            file_info = None
+            for peer in peers:
+                try:
+                    peer_info = self.download_range(peer, file_name, 0, 0, hashes=True)
+                    if (file_hash is not None and peer_info.get('HASH', file_hash) != file_hash):
+                        raise ValueError('Peer holds another version of {}'.format(file_name))
+                    if ('HASH' in peer_info and hash_root(peer_info['CHUNK_HASHES']) != peer_info['HASH']):
+                        raise ValueError('Chunk hashes do not match the hash of {}'.format(file_name))
+                except (OSError, ValueError) as err:
+                    failures[peer] = SWARM_MAX_PEER_FAILURES
+                    self.print_log('ERROR: Peer {}:{} failed: {}'.format(peer[0], peer[1], err))
+                    continue
+
+                if (file_info is None or 'CHUNK_HASHES' in peer_info):
+                    file_info = peer_info
+                if ('CHUNK_HASHES' in file_info):
+                    break # Otherwise the next peers are asked, a peer sends no hashes until it has hashed the file
+            if (file_info is None):
+                raise ConnectionError('No peer holding {} is available'.format(file_name))
+
+            size = file_info['SIZE']
+            start = self.swarm_resume_offset(file_name, file_info)
+
+            with open(path + PARTIAL_FILE_SUFFIX, 'r+b' if start else 'wb') as file:
+                file.truncate(size) # Preallocate the file for the ranges written out of order
+
+            ranges = RangeScheduler(size, SWARM_RANGE_SIZE, start=start)
+            self.print_log('Downloading {} bytes in {} ranges from {} peers...'.format(size, ranges.remaining(), len(peers)))
+
+            # Ranges put back by a peer after the others stopped are downloaded again by the peers still available
+            while (not ranges.is_complete()):
+                available_peers = [peer for peer in peers if failures[peer] < SWARM_MAX_PEER_FAILURES]
+                if (not available_peers):
+                    raise ConnectionError('All peers holding {} failed'.format(file_name))
+
+                peer_threads = [threading.Thread(target=self.swarm_peer, args=(peer, file_name, file_info, ranges, failures), daemon=True)
+                    for peer in available_peers]
+                for peer_thread in peer_threads:
+                    peer_thread.start()
+                for peer_thread in peer_threads:
+                    peer_thread.join()
+                if (ranges.error is not None):
+                    raise ranges.error
+
+            os.replace(path + PARTIAL_FILE_SUFFIX, path)
+            self.discard_progress(file_name)
+            self.print_log('Download complete')
+            return True
+
+        except OSError as err:
+            self.print_log('ERROR: {}'.format(err))
+            if (ranges is not None):
+                self.save_swarm_progress(file_name, file_info, ranges)
+            return False
+
+    def swarm_resume_offset(self, file_name: str, file_info: dict) -> int:
+        """
+        Returns the offset a swarm download of the file resumes from, after the bytes of an interrupted download of the same
+        version of the file, 0 if there is none. The chunks already received are verified against the chunk hashes, if known.
+        """
+
+        progress = self.load_progress(file_name)
+        if (progress is None or progress['SIZE'] != file_info['SIZE'] or
+            progress.get('HASH') not in (None, file_info.get('HASH'))):
+            return 0
+
+        start = progress['RECEIVED'] - progress['RECEIVED'] % SWARM_RANGE_SIZE # Whole ranges only
+        if ('CHUNK_HASHES' in file_info):
+            path = os.path.join(PUBLIC_FOLDER, file_name)
+            with open(path + PARTIAL_FILE_SUFFIX, 'rb') as file:
+                for offset in range(0, start, HASH_CHUNK_SIZE):
+                    if (hash_chunk(file.read(HASH_CHUNK_SIZE)) != file_info['CHUNK_HASHES'][offset // HASH_CHUNK_SIZE]):
+                        start = offset
+                        break
+
+        if (start > 0):
+            self.print_log('Resuming download from byte {} of {}'.format(start, file_info['SIZE']))
+        return start
+
+    def save_swarm_progress(self, file_name: str, file_info: dict, ranges: RangeScheduler):
+        """Save the progress of a swarm download stopped, up to the first range not received."""
+
+        progress = {
+            'FILE_NAME': file_name,
+            'SIZE': file_info['SIZE'],
+            'HASH': file_info.get('HASH'),
+            'RECEIVED': ranges.completed()
+        }
+        try:
+            self.save_progress(progress)
+        except OSError as err:
+            self.print_log('ERROR: Progress of {} not saved: {}'.format(file_name, err))
+
+    def swarm_peer(self, peer: tuple, file_name: str, file_info: dict, ranges: RangeScheduler, failures: dict):
+        """
+        Download ranges of the file from a peer until no range is left or the peer failed too often.
+        Each range is one chunk of the file, verified against its hash if the chunk hashes are known.
+        A range is received in memory and written to the file only by the peer completing it first.
+        The download is stopped if the file cannot be written, or if this thread fails unexpectedly.
+        """
+
+        try:
+            self.swarm_ranges(peer, file_name, file_info, ranges, failures)
+        except Exception as err:
+            ranges.abort(err if isinstance(err, OSError) else OSError('Download from {}:{} failed: {!r}'.format(peer[0], peer[1], err)))
+
+    def swarm_ranges(self, peer: tuple, file_name: str, file_info: dict, ranges: RangeScheduler, failures: dict):
+        path = os.path.join(PUBLIC_FOLDER, file_name)
+        with open(path + PARTIAL_FILE_SUFFIX, 'r+b') as file:
+            while (failures[peer] < SWARM_MAX_PEER_FAILURES):
+                next_range = ranges.next(peer)
+                if (next_range is None):
+                    return
+                offset, length = next_range
+
+                data = io.BytesIO()
+                try:
+                    chunk_hash = file_info['CHUNK_HASHES'][offset // HASH_CHUNK_SIZE] if 'CHUNK_HASHES' in file_info else None
+                    body = self.download_range(peer, file_name, offset, length, data, chunk_hash,
+                                               on_connect=lambda download_socket: ranges.connected(peer, offset, download_socket))
+                    if (body['SIZE'] != file_info['SIZE']):
+                        raise ValueError('File size differs from the other peers')
+
+                except (OSError, ValueError) as err:
+                    if (ranges.fail(peer, offset)):
+                        failures[peer] += 1
+                        self.print_log('ERROR: Peer {}:{} failed: {}'.format(peer[0], peer[1], err))
+                    continue
+
+                if (not ranges.complete(peer, offset)):
+                    continue # Received from another peer first
+                try:
+                    file.seek(offset)
+                    file.write(data.getbuffer())
+                    file.flush() # A range counted in the progress saved must be in the file
+                except OSError as err:
+                    ranges.put_back(offset, length)
+                    ranges.abort(err) # Other ranges would not be written either
+                    return
+                self.print_log('Received bytes {}-{} from {}:{}'.format(offset, offset + length - 1, peer[0], peer[1]))
+
+    def download_range(self, peer: tuple, file_name: str, offset: int, length: int, file=None, chunk_hash: str = None, hashes: bool = False,
+                       on_connect=None) -> dict:
+        """
+        Download a range of the file from a peer with a `STREAM` mode download request and write it to the file at its current position.
+        If `chunk_hash` is given the range is verified against it. Returns the body of the `FILE-STREAM` response, with the size
+        of the file on the peer and its hashes if `hashes` are requested. `on_connect` is called with the socket once connected.
+        """
+
+        with socket.create_connection(peer, timeout=SWARM_TIMEOUT) as download_socket:
+            if (on_connect is not None):
+                on_connect(download_socket)
+            payload = {
+                'RQ#': self.get_rq_num(),
+                'FILE_NAME': file_name,
+                'MODE': 'STREAM',
+                'OFFSET': offset,
+                'LENGTH': length,
+                'HASHES': hashes,
+                'ENCODINGS': COMPRESSION_CODECS,
+                'NAME': self.client_name # Bytes sent are counted for this client by the peer
+            }
+            download_socket.sendall(msg_lib.create_request('DOWNLOAD', payload))
+
+            reader = FrameReader(download_socket)
+            body = self.receive_stream_header(reader)
+            if ('STATUS' in body and body['STATUS'] == 'DOWNLOAD-ERROR'):
+                raise ValueError(body['REASON'])
+            if (body['LENGTH'] != length):
+                raise ValueError('Range {}-{} is outside of the file'.format(offset, offset + length - 1))
+
+            if (file is not None):
+                hasher = chunk_hasher() if chunk_hash is not None else None
+                self.receive_range(reader, file, length, hasher=hasher, decompressor=create_decompressor(body.get('ENCODING', 'none')))
+                if (hasher is not None and hasher.hexdigest() != chunk_hash):
+                    raise ValueError('Range {}-{} failed verification'.format(offset, offset + length - 1))
+            return body
+
+    def handle_download(self, host: str, port: int, file_name: str, mode: str = 'STREAM'):
         """
         Create payload for download method, create a new socket to perform download and send request to client.
         Keep receiving chunks until all chunks are received. Assemble file and close download socket. If `DOWNLOAD-ERROR`
-        is received, display error message and close download socket.
+        is received, display error message and close download socket. In `STREAM` mode the file is received as raw bytes, see `receive_stream`,
+        and a download interrupted before is resumed from the last byte received. Returns True if the file is downloaded.
         """
 
         download_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -449,185 +769,384 @@ class Client:
             rq_num = self.get_rq_num()
             payload = {
                 'RQ#': rq_num,
-                'FILE_NAME': file_name
+                'FILE_NAME': file_name,
+                'MODE': mode,
+                'HASHES': True,
+                'ENCODINGS': COMPRESSION_CODECS,
+                'NAME': self.client_name # Bytes sent are counted for this client by the peer
             }
 
+            progress = self.load_progress(file_name) if mode == 'STREAM' else None
+            if (progress is not None):
+                payload['OFFSET'] = progress['RECEIVED']
+                self.print_log('Resuming download from byte {} of {}'.format(progress['RECEIVED'], progress['SIZE']))
+
             self.print_log('Sending download request RQ# {}...'.format(rq_num))
             request = msg_lib.create_request('DOWNLOAD', payload)
             download_socket.send(request)
             self.print_log('Download request successfully sent')
+
+            reader = FrameReader(download_socket)
+            if (mode == 'STREAM'):
+                return self.receive_stream(reader, file_name, progress)
             
-            # Handle Response of Files
-            self.print_log('Downloading...')
-            chunk_dict = {}
-            stop_download_check = False
-
-            while (True):
-                data = download_socket.recv(HEADER_SIZE).decode(FORMAT)
-                method_call = msg_lib.extract_method(data)
-                header = msg_lib.extract_headers(data)
-                content_length = header['content-length']
-
-                data = download_socket.recv(content_length).decode(FORMAT)
-                body = json.loads(data)
-                self.print_log('Incoming Data\n{}\n'.format(data))
-
-                if ('STATUS' in body and body['STATUS'] == 'DOWNLOAD-ERROR'):
-                    self.print_log('DOWNLOAD-ERROR: {}'.format(body['REASON']))
-                    return
+            # Handle Response of Files, chunks are written to a temporary file as they are received
+            path = os.path.join(PUBLIC_FOLDER, file_name)
+            self.print_log('Downloading to {}...'.format(path + CHUNK_FILE_SUFFIX))
 
-                chunk_num = body['CHUNK#']
-                chunk = body['TEXT']
-                chunk_dict[chunk_num] = chunk
+            with ChunkWriter(path) as writer:
+                while (not writer.is_complete()): # Ensure all file chunks from 0 to EOF chunk# are written before renaming the file
+                    message = reader.read_message()
+                    method_call, body = message.method, message.body
+                    self.print_log('Incoming Data\n{}\n'.format(body))
 
-                if (method_call == 'file_end'):
-                    total_chunk_num = body['CHUNK#']
-                    stop_download_check = True
+                    if ('STATUS' in body and body['STATUS'] == 'DOWNLOAD-ERROR'):
+                        self.print_log('DOWNLOAD-ERROR: {}'.format(body['REASON']))
+                        return False
 
-                if (stop_download_check): # Ensure all file chunks from 0 to EOF chunk# are received before assembling file
-                    total_chunk_set = set(range(1, total_chunk_num + 1))
-                    current_chunk_set = set(chunk_dict.keys())
-                    if (total_chunk_set.issubset(current_chunk_set)):
-                        break
-            
-            # Assemble File
-            path = os.path.join('..\public', file_name)
-            self.print_log('Assembling file to {}'.format(path))
+                    writer.add(body['CHUNK#'], body['TEXT'], method_call == 'file_end')
 
-            with open(path, 'w') as file:
-                for i in range(total_chunk_num + 1):
-                    file.write(chunk_dict[i])
+                writer.commit()
 
             self.print_log('Download complete')
+            return True
 
-        except OSError as err:
+        except (OSError, ValueError) as err:
             self.print_log('ERROR: {}'.format(err))
+            return False
 
         finally:
             download_socket.close()
             self.print_log('Connection {}:{} closed'.format(host, port))
-            self.button_toggle("enable")
 
-    def display_client_name(self):
+    def receive_stream(self, reader: FrameReader, file_name: str, progress: dict = None):
         """
-        Function to write the client's name to the GUI
+        Receive the `FILE-STREAM` response announcing the size of the file, then receive the raw bytes of the file
+        and write them to a partial file in public folder. The progress of the download is saved next to it
+        so an interrupted download can be resumed, the partial file is renamed once complete and verified. Returns True if it is.
         """
-        self.client_name_label.config(text="Client: {}".format(self.client_name))
 
-    def insert_log(self,msg):
+        body = self.receive_stream_header(reader)
+        if ('STATUS' in body and body['STATUS'] == 'DOWNLOAD-ERROR'):
+            self.print_log('DOWNLOAD-ERROR: {}'.format(body['REASON']))
+            return False
+
+        file_hash = body.get('HASH', progress.get('HASH') if progress is not None else None) # Peer may not have hashed the file yet
+        if (progress is not None and (progress['SIZE'] != body['SIZE'] or progress.get('HASH') not in (None, file_hash))):
+            self.print_log('ERROR: File changed since the download was interrupted, download it again')
+            self.discard_progress(file_name)
+            return False
+
+        path = os.path.join(PUBLIC_FOLDER, file_name)
+        self.print_log('Writing file to {}'.format(path + PARTIAL_FILE_SUFFIX))
+        progress = {
+            'FILE_NAME': file_name,
+            'SIZE': body['SIZE'],
+            'HASH': file_hash,
+            'RECEIVED': body['OFFSET']
+        }
+
+        try:
+            decompressor = create_decompressor(body.get('ENCODING', 'none')) # Peers sending uncompressed streams only may not send it
+        except ValueError as err:
+            self.print_log('ERROR: {}'.format(err))
+            return False
+        if (decompressor is not None):
+            self.print_log('Receiving file compressed with {}'.format(body['ENCODING']))
+
+        with open(path + PARTIAL_FILE_SUFFIX, 'r+b' if body['OFFSET'] else 'wb') as file:
+            file.seek(body['OFFSET'])
+            file.truncate()
+            self.save_progress(progress) # Resumable from the start, even if the client is killed before the next save
+            with self.downloads_lock:
+                self.downloads[file_name] = (file, progress)
+            try:
+                self.receive_range(reader, file, body['LENGTH'], progress, decompressor=decompressor)
+            finally:
+                with self.downloads_lock:
+                    del self.downloads[file_name]
+                file.flush()
+                self.save_progress(progress)
+
+        if ('CHUNK_HASHES' in body):
+            try:
+                self.verify_download(reader.sock.getpeername(), file_name, body)
+            except ValueError as err:
+                self.print_log('ERROR: {}'.format(err))
+                self.discard_progress(file_name)
+                return False
+
+        os.replace(path + PARTIAL_FILE_SUFFIX, path)
+        self.discard_progress(file_name)
+        self.print_log('Download complete')
+        return True
+
+    def verify_download(self, peer: tuple, file_name: str, body: dict):
         """
-        Function to write text to log in the GUI
+        Check each chunk of the partial file against the chunk hashes sent by the peer,
+        and download the chunks failing verification again until they all pass.
         """
-        self.log_text.configure(state=NORMAL)
-        self.log_text.insert(tk.END, msg + "\n")
-        self.log_text.configure(state=DISABLED)
-        
-    def button_toggle(self, button_name: str):
-        """
-        Function to toggle buttons on and off depending on whether a task is running or not
-        """
-        if button_name == "server":
-            self.register_button.config(state=NORMAL)
-            self.degister_button.config(state=NORMAL)
-            self.updatecontact_button.config(state=NORMAL)
-        elif button_name == "disable":
-            self.register_button.config(state=DISABLED)
-            self.degister_button.config(state=DISABLED)
-            self.publish_button.config(state=DISABLED)
-            self.remove_button.config(state=DISABLED)
-            self.retrieveall_button.config(state=DISABLED)
-            self.retrieveinfo_button.config(state=DISABLED)
-            self.searchfile_button.config(state=DISABLED)
-            self.download_button.config(state=DISABLED)
-            self.updatecontact_button.config(state=DISABLED)
-            self.connect_button.config(state=DISABLED)
-        elif button_name == "enable":
-            self.register_button.config(state=NORMAL)
-            self.degister_button.config(state=NORMAL)
-            self.publish_button.config(state=NORMAL)
-            self.remove_button.config(state=NORMAL)
-            self.retrieveall_button.config(state=NORMAL)
-            self.retrieveinfo_button.config(state=NORMAL)
-            self.searchfile_button.config(state=NORMAL)
-            self.download_button.config(state=NORMAL)
-            self.updatecontact_button.config(state=NORMAL)
-            self.connect_button.config(state=NORMAL)
-
-    def gui(self):
-        """
-        Function to create the GUI for the user to interact with including all entry fields, buttons and log text field
-        """
-        window = tk.Tk()
-        window.geometry("1200x900")
-        window.title("COEN366 - Networking Project : Client Program")
-        window.resizable(False, False)
-
-        scroll_bar = tk.Scrollbar(window)
-        scroll_bar.pack(side=RIGHT, fill=Y)
-
-        self.log_text = tk.Text(window, height=51, width=147, yscrollcommand=scroll_bar.set, state=DISABLED)
-        self.log_text.place(x=0, y=100)
-
-        scroll_bar.config(command=self.log_text.yview)
-
-        self.client_name_label = tk.Label(text="Client: ")
-        self.client_name_label.place(x=0, y=0)
-
-        name_label = tk.Label(text="Name").place(x=0, y=25)
-        name_entry = tk.Entry(window, width=20)
-        name_entry.place(x=50, y=25)
-        
-        file_name_label = tk.Label(text="File Name(s)").place(x=190, y=25)
-        file_name_entry = tk.Entry(window, width=87)
-        file_name_entry.place(x=270, y=25)
-        
-        host_name_label = tk.Label(text="Host").place(x=0, y=50)
-        host_name_entry = tk.Entry(window, width=20)
-        host_name_entry.place(x=50, y=50)
-        
-        port_name_label = tk.Label(text="Port Number").place(x=190, y=50)
-        port_name_entry = tk.Entry(window, width=10)
-        port_name_entry.place(x=270, y=50)
-        port_name_entry.insert(0, '9000')
-             
-        self.register_button = tk.Button(window, text="Register", width=10, state = DISABLED, command=lambda: self.register(name_entry.get().strip()))
-        self.register_button.place(x=0, y=75)
 
-        self.degister_button = tk.Button(window, text="Deregister", width=10, state = DISABLED, command=lambda: self.de_register())
-        self.degister_button.place(x=85, y=75)
+        if (hash_root(body['CHUNK_HASHES']) != body['HASH']):
+            raise ValueError('Chunk hashes sent by the peer do not match the hash of {}'.format(file_name))
+
+        path = os.path.join(PUBLIC_FOLDER, file_name)
+        failed_chunks = range(len(body['CHUNK_HASHES']))
+        with open(path + PARTIAL_FILE_SUFFIX, 'r+b') as file:
+            for attempt in range(MAX_VERIFY_ATTEMPTS + 1):
+                chunks = failed_chunks
+                failed_chunks = []
+                for chunk_num in chunks:
+                    file.seek(chunk_num * HASH_CHUNK_SIZE)
+                    if (hash_chunk(file.read(HASH_CHUNK_SIZE)) != body['CHUNK_HASHES'][chunk_num]):
+                        failed_chunks.append(chunk_num)
+
+                if (not failed_chunks):
+                    return
+                if (attempt == MAX_VERIFY_ATTEMPTS):
+                    break
 
-        self.publish_button = tk.Button(window, text="Publish", width=10, state = DISABLED, command=lambda: self.publish(file_name_entry.get().strip()))
-        self.publish_button.place(x=170, y=75)
+                self.print_log('{} chunks failed verification, downloading them again...'.format(len(failed_chunks)))
+                for chunk_num in failed_chunks:
+                    offset = chunk_num * HASH_CHUNK_SIZE
+                    file.seek(offset)
+                    self.download_range(peer, file_name, offset, min(HASH_CHUNK_SIZE, body['SIZE'] - offset), file)
+                file.flush()
 
-        self.remove_button = tk.Button(window, text="Remove", width=10, state = DISABLED, command=lambda: self.remove(file_name_entry.get().strip()))
-        self.remove_button.place(x=255, y=75)
+        raise ValueError('{} chunks of {} still fail verification'.format(len(failed_chunks), file_name))
+
+    def receive_stream_header(self, reader: FrameReader) -> dict:
+        """
+        Receive the `FILE-STREAM` response, or `DOWNLOAD-ERROR` response, sent before the bytes of a file. Returns its body.
+        """
 
-        self.retrieveall_button = tk.Button(window, text="Retrieve-all", width=10, state = DISABLED, command=lambda: self.retrieve_all())
-        self.retrieveall_button.place(x=340, y=75)
+        body = reader.read_message().body
+        self.print_log('Incoming Data\n{}\n'.format(body))
+        return body
 
-        self.retrieveinfo_button = tk.Button(window, text="Retrieve-info", width=10, state = DISABLED, command=lambda: self.retrieve_info(name_entry.get().strip()))
-        self.retrieveinfo_button.place(x=425, y=75)
+    def receive_range(self, reader: FrameReader, file, length: int, progress: dict = None, hasher=None, decompressor=None):
+        """
+        Receive `length` raw bytes of a file into the reader's buffer and write them straight to the file at its current position.
+        If a download progress is given, its received bytes are counted and it is saved every `PROGRESS_SAVE_INTERVAL` bytes
+        or `PROGRESS_SAVE_PERIOD` seconds.
+        If a hash object is given, it is updated with the bytes received.
+        If a decompressor is given, the bytes received are a compressed stream decompressed as they are received.
+        """
 
-        self.searchfile_button = tk.Button(window, text="Search-file", width=10, state = DISABLED, command=lambda: self.search_file(file_name_entry.get().split(',')[0].strip()))
-        self.searchfile_button.place(x=510, y=75)
+        remaining = length
+        saved = progress['RECEIVED'] if progress is not None else 0
+        save_time = time.monotonic()
 
-        self.download_button = tk.Button(window, text="Download", width=10, state = DISABLED, command=lambda: self.download(host_name_entry.get().strip(), port_name_entry.get().strip(), file_name_entry.get().split(',')[0].strip()))
-        self.download_button.place(x=595, y=75)
+        while (remaining > 0):
+            try:
+                data = reader.read_bytes(remaining if decompressor is None else STREAM_BUFFER_SIZE)
+            except ConnectionError:
+                raise ConnectionError('Connection closed with {} bytes left to download'.format(remaining))
+            pieces = [data] if decompressor is None else self.decompress(decompressor, data, remaining)
+            for data in pieces:
+                file.write(data)
+                remaining -= len(data)
+                if (hasher is not None):
+                    hasher.update(data)
+
+                if (progress is not None):
+                    progress['RECEIVED'] += len(data)
+                    if (progress['RECEIVED'] - saved >= PROGRESS_SAVE_INTERVAL or time.monotonic() - save_time >= PROGRESS_SAVE_PERIOD):
+                        file.flush() # Bytes counted in the progress must be in the file
+                        self.save_progress(progress)
+                        saved = progress['RECEIVED']
+                        save_time = time.monotonic()
+
+    def decompress(self, decompressor, data, remaining: int):
+        """
+        Decompress the next bytes of a compressed stream, of which `remaining` bytes are left, in pieces of at most
+        `STREAM_BUFFER_SIZE` bytes so a small stream expanding to more than the range is never held in memory.
+        Raises ValueError if the stream is invalid or longer than the range.
+        """
 
-        self.updatecontact_button = tk.Button(window, text="Update-contact", width=15, state = DISABLED, command=lambda: self.update_contact(name_entry.get().strip()))
-        self.updatecontact_button.place(x=680, y=75)
+        while (not decompressor.eof):
+            max_length = min(remaining, STREAM_BUFFER_SIZE) or 1 # A single byte more than the range is enough to reject it
+            try:
+                piece = decompressor.decompress(data, max_length=max_length)
+            except Exception as err: # zlib.error or lzma.LZMAError
+                raise ValueError('Compressed stream is invalid: {}'.format(err))
+            data = getattr(decompressor, 'unconsumed_tail', b'') # Input left by zlib, lzma keeps it itself
+            if (len(piece) > remaining):
+                raise ValueError('Compressed stream is longer than the range downloaded')
+            remaining -= len(piece)
+            if (piece):
+                yield piece
+            if (len(piece) < max_length):
+                break # All the input is decompressed
+
+        if (decompressor.eof and remaining > 0):
+            raise ValueError('Compressed stream ended with {} bytes left to download'.format(remaining))
+
+    def load_progress(self, file_name: str):
+        """
+        Return the progress saved by an interrupted download of the file, None if there is none.
+        The bytes received are limited to the size of the partial file, in case its last writes were lost.
+        """
 
-        self.connect_button = tk.Button(window, text="Connect to Server", width=15, command=lambda: self.connect_to_server(host_name_entry.get().strip(), port_name_entry.get().strip()))
-        self.connect_button.place(x=1066, y=75)
+        path = os.path.join(PUBLIC_FOLDER, file_name)
+        try:
+            with open(path + PROGRESS_FILE_SUFFIX, 'r') as file:
+                progress = json.load(file)
+            progress['RECEIVED'] = min(progress['RECEIVED'], os.path.getsize(path + PARTIAL_FILE_SUFFIX))
+            return progress
+
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save_progress(self, progress: dict):
+        path = os.path.join(PUBLIC_FOLDER, progress['FILE_NAME'])
+        with self.downloads_lock: # Saved by the download and by `save_downloads` when the client stops
+            with open(path + PROGRESS_FILE_SUFFIX, 'w') as file:
+                json.dump(progress, file)
+
+    def save_downloads(self):
+        """Save the progress of the streamed downloads running, so they are resumed if the client stops before they end."""
+
+        with self.downloads_lock:
+            downloads = list(self.downloads.values())
+        for file, progress in downloads:
+            progress = dict(progress) # Bytes counted before the flush are in the file
+            try:
+                file.flush()
+                self.save_progress(progress)
+            except (OSError, ValueError): # Download ended and its file closed meanwhile
+                pass
 
-        self.start_ui_lock.release()
+    def discard_progress(self, file_name: str):
+        """Delete the partial file and progress of a download."""
 
-        window.mainloop()
+        path = os.path.join(PUBLIC_FOLDER, file_name)
+        for suffix in (PARTIAL_FILE_SUFFIX, PROGRESS_FILE_SUFFIX):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+
+def run_command(client: Client, args) -> int:
+    """
+    Run the command given on the command line and print its result as JSON to stdout. Returns the exit code,
+    1 if there is no result or the server denied the request.
+    """
+
+    if (args.command == 'serve'):
+        print(json.dumps({'IP_ADDRESS': client.host, 'TCP_SOCKET': client.tcp_port}), flush=True)
+        try:
+            threading.Event().wait() # Uploads are sent on the client's threads until interrupted
+        except KeyboardInterrupt:
+            pass
+        print(json.dumps(client.upload_stats()))
+        return 0
+
+    if (args.command == 'download'):
+        result = client.download(args.peer_host, args.peer_port, args.file_name, args.transfer)
+    else:
+        host, _, port = args.server.rpartition(':')
+        if (not client.connect_to_server(host, port)):
+            print('Server needs to be given as HOST:PORT', file=sys.stderr)
+            return 2
+        if (args.command not in ('register', 'update-contact')):
+            client.client_name = args.name
+
+        if (args.command == 'register'):
+            result = client.register(args.name)
+        elif (args.command == 'de-register'):
+            result = client.de_register()
+        elif (args.command == 'update-contact'):
+            result = client.update_contact(args.name)
+        elif (args.command == 'publish'):
+            result = client.publish(','.join(args.file_names))
+        elif (args.command == 'remove'):
+            result = client.remove(','.join(args.file_names))
+        elif (args.command == 'retrieve-all'):
+            result = client.retrieve_all()
+        elif (args.command == 'retrieve-info'):
+            result = client.retrieve_info(args.search_name)
+        elif (args.command == 'search-file'):
+            result = client.search_file(args.file_name, args.mode)
+        elif (args.command == 'batch'):
+            result = client.batch(json.loads(args.requests))
+        else:
+            result = client.swarm_download(args.file_name)
 
+    print(json.dumps(result, indent=2))
+    bodies = result if isinstance(result, list) else [result]
+    if (not result or any(isinstance(body, dict) and ('DENIED' in body.get('STATUS', '') or 'ERROR' in body.get('STATUS', ''))
+                          for body in bodies)):
+        return 1
+    return 0
 
 
 def main():
-    client = Client()
+    parser = argparse.ArgumentParser(description='Station to Station client, starts the GUI unless a command is given')
+    parser.add_argument('--binary', action='store_true', help='send requests to the server with the binary header')
+    parser.add_argument('--upload-backlog', type=int, default=UPLOAD_BACKLOG, help='connections from other clients waiting to be accepted')
+    parser.add_argument('--max-uploads', type=int, default=MAX_UPLOADS, help='downloads sent to other clients at the same time')
+    parser.add_argument('--upload-queue', type=int, default=UPLOAD_QUEUE_SIZE, help='download requests waiting before being refused')
+    parser.add_argument('--upload-rate', type=int, default=UPLOAD_RATE // 1024, help='KiB/s sent to other clients in total, 0 for no limit')
+    parser.add_argument('--compression-level', type=int, default=COMPRESSION_LEVEL, help='level of the downloads compressed for other clients, 0 for none')
+    parser.add_argument('--cache-ttl', type=float, default=CLIENT_CACHE_TTL, help='seconds the responses to lookups are cached, 0 to not cache them')
+    parser.add_argument('--max-in-flight', type=int, default=UDP_MAX_IN_FLIGHT, help='requests waiting for a response from the server at the same time')
+    parser.add_argument('--max-retries', type=int, default=UDP_MAX_RETRIES, help='times a request to the server is sent again without response')
+    parser.add_argument('--request-deadline', type=float, default=UDP_REQUEST_DEADLINE, help='seconds after which a request to the server is given up')
+    parser.add_argument('--connection-rate', type=int, default=UPLOAD_CONNECTION_RATE // 1024, help='KiB/s sent on each download, 0 for no limit')
+    parser.add_argument('--host', default=None, help='IP address other clients download from, the PC\'s current IP by default')
+    parser.add_argument('--tcp-port', type=int, default=None, help='port other clients download from, random by default')
+    parser.add_argument('--server', default='localhost:9000', help='HOST:PORT of the server the commands are sent to')
+    parser.add_argument('--name', default='', help='name of the client the commands are sent for')
+    parser.add_argument('--verbose', action='store_true', help='print the logs of the command to stderr')
+
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.add_parser('register', help='register --name with --host and --tcp-port')
+    commands.add_parser('de-register', help='de-register --name')
+    commands.add_parser('update-contact', help='update --name with --host and --tcp-port')
+    publish_parser = commands.add_parser('publish', help='publish files of the public folder')
+    publish_parser.add_argument('file_names', nargs='+')
+    remove_parser = commands.add_parser('remove', help='remove published files')
+    remove_parser.add_argument('file_names', nargs='+')
+    commands.add_parser('retrieve-all', help='retrieve all clients and their files')
+    retrieve_info_parser = commands.add_parser('retrieve-info', help='retrieve a client and its files')
+    retrieve_info_parser.add_argument('search_name')
+    search_file_parser = commands.add_parser('search-file', help='search the clients holding a file')
+    search_file_parser.add_argument('file_name')
+    search_file_parser.add_argument('--mode', choices=SEARCH_MODES, default='EXACT')
+    batch_parser = commands.add_parser('batch', help='send a JSON list of requests in a single BATCH request')
+    batch_parser.add_argument('requests')
+    download_parser = commands.add_parser('download', help='download a file from another client')
+    download_parser.add_argument('peer_host')
+    download_parser.add_argument('peer_port')
+    download_parser.add_argument('file_name')
+    download_parser.add_argument('--transfer', choices=TRANSFER_MODES, default='STREAM')
+    swarm_download_parser = commands.add_parser('swarm-download', help='download a file from all the clients holding it')
+    swarm_download_parser.add_argument('file_name')
+    commands.add_parser('serve', help='send downloads to other clients until interrupted')
+    args = parser.parse_args()
+
+    client_args = (BINARY_CONTENT_TYPE if args.binary else TEXT_CONTENT_TYPE, args.upload_backlog, args.max_uploads, args.upload_queue,
+                   args.upload_rate * 1024, args.connection_rate * 1024, args.compression_level, args.cache_ttl,
+                   args.max_in_flight, args.max_retries, args.request_deadline, args.host, args.tcp_port)
+
+    def handle_signal(signum, frame):
+        sys.exit(128 + signum) # Stop through the `finally` blocks, the progress of the downloads running is saved
+
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    if (args.command is None):
+        signal.signal(signal.SIGINT, handle_signal) # KeyboardInterrupt would be caught by the tkinter callback running
+        from client_gui import ClientGui # tkinter is only imported when the GUI is used
+        ClientGui(*client_args).run()
+        return
+
+    client = Client(*client_args, log_stream=sys.stderr if args.verbose else None)
+    try:
+        exit_code = run_command(client, args)
+    finally:
+        client.stop_client()
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
    main()
@@ -0,0 +1,225 @@
+import threading, queue
+import tkinter as tk
+from tkinter.constants import DISABLED, NORMAL, RIGHT, Y
+
+from client import Client
+from models.constants import GUI_POLL_INTERVAL
+
+
+class ClientGui(Client):
+    """
+    GUI on top of the headless client. Widgets are only touched by the tkinter thread, requests are sent on a new
+    thread and their logs and the end of the task are passed to the tkinter thread through a queue it polls.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.ui_queue = queue.Queue()
+        self.window = None
+        self.gui()
+        super().__init__(*args, **kwargs)
+
+    def print_log(self, msg: str):
+        """
+        Attaches timestamp to message and prints to GUI & terminal.
+        """
+        log = super().print_log(msg)
+        self.ui_queue.put(lambda: self.insert_log(log))
+        return log
+
+    def run_task(self, task, *args):
+        """
+        Disable the buttons and run the task on a new thread, the buttons are enabled again once it is done.
+        """
+
+        self.button_toggle("disable")
+
+        def run():
+            try:
+                task(*args)
+            finally:
+                self.ui_queue.put(self.task_done)
+
+        task_thread = threading.Thread(target=run, daemon=True)
+        task_thread.start()
+
+    def task_done(self):
+        self.button_toggle("enable")
+        self.display_client_name()
+
+    def poll_ui_queue(self):
+        """
+        Apply the updates queued by the other threads to the widgets, then poll again after `GUI_POLL_INTERVAL` ms.
+        """
+        while (True):
+            try:
+                update = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            update()
+
+        self.window.after(GUI_POLL_INTERVAL, self.poll_ui_queue)
+
+    def connect(self, host: str, port: str):
+        if (self.connect_to_server(host, port)):
+            self.button_toggle("enable")
+
+    def set_limits(self, upload_rate: str, connection_rate: str):
+        """
+        Change the upload limits entered in KiB per second, an empty or 0 limit removes it.
+        """
+
+        rates = []
+        for rate in (upload_rate, connection_rate):
+            if (rate == ''):
+                rates.append(0)
+            elif (not rate.isdecimal()):
+                self.print_log("Upload limits need to be integer values in KiB/s")
+                return
+            else:
+                rates.append(int(rate) * 1024)
+
+        self.set_upload_limits(rates[0], rates[1])
+
+    def display_client_name(self):
+        """
+        Function to write the client's name to the GUI
+        """
+        self.client_name_label.config(text="Client: {}".format(self.client_name))
+
+    def insert_log(self,msg):
+        """
+        Function to write text to log in the GUI
+        """
+        self.log_text.configure(state=NORMAL)
+        self.log_text.insert(tk.END, msg + "\n")
+        self.log_text.configure(state=DISABLED)
+
+    def button_toggle(self, button_name: str):
+        """
+        Function to toggle buttons on and off depending on whether a task is running or not
+        """
+        if button_name == "disable":
+            self.register_button.config(state=DISABLED)
+            self.degister_button.config(state=DISABLED)
+            self.publish_button.config(state=DISABLED)
+            self.remove_button.config(state=DISABLED)
+            self.retrieveall_button.config(state=DISABLED)
+            self.retrieveinfo_button.config(state=DISABLED)
+            self.searchfile_button.config(state=DISABLED)
+            self.download_button.config(state=DISABLED)
+            self.swarmdownload_button.config(state=DISABLED)
+            self.updatecontact_button.config(state=DISABLED)
+            self.connect_button.config(state=DISABLED)
+        elif button_name == "enable":
+            self.register_button.config(state=NORMAL)
+            self.degister_button.config(state=NORMAL)
+            self.publish_button.config(state=NORMAL)
+            self.remove_button.config(state=NORMAL)
+            self.retrieveall_button.config(state=NORMAL)
+            self.retrieveinfo_button.config(state=NORMAL)
+            self.searchfile_button.config(state=NORMAL)
+            self.download_button.config(state=NORMAL)
+            self.swarmdownload_button.config(state=NORMAL)
+            self.updatecontact_button.config(state=NORMAL)
+            self.connect_button.config(state=NORMAL)
+
+    def gui(self):
+        """
+        Function to create the GUI for the user to interact with including all entry fields, buttons and log text field
+        """
+        window = tk.Tk()
+        window.geometry("1200x900")
+        window.title("COEN366 - Networking Project : Client Program")
+        window.resizable(False, False)
+        self.window = window
+
+        scroll_bar = tk.Scrollbar(window)
+        scroll_bar.pack(side=RIGHT, fill=Y)
+
+        self.log_text = tk.Text(window, height=51, width=147, yscrollcommand=scroll_bar.set, state=DISABLED)
+        self.log_text.place(x=0, y=100)
+
+        scroll_bar.config(command=self.log_text.yview)
+
+        self.client_name_label = tk.Label(text="Client: ")
+        self.client_name_label.place(x=0, y=0)
+
+        name_label = tk.Label(text="Name").place(x=0, y=25)
+        name_entry = tk.Entry(window, width=20)
+        name_entry.place(x=50, y=25)
+
+        file_name_label = tk.Label(text="File Name(s)").place(x=190, y=25)
+        file_name_entry = tk.Entry(window, width=87)
+        file_name_entry.place(x=270, y=25)
+
+        host_name_label = tk.Label(text="Host").place(x=0, y=50)
+        host_name_entry = tk.Entry(window, width=20)
+        host_name_entry.place(x=50, y=50)
+
+        port_name_label = tk.Label(text="Port Number").place(x=190, y=50)
+        port_name_entry = tk.Entry(window, width=10)
+        port_name_entry.place(x=270, y=50)
+        port_name_entry.insert(0, '9000')
+
+        upload_rate_label = tk.Label(text="Upload KiB/s").place(x=350, y=50)
+        upload_rate_entry = tk.Entry(window, width=10)
+        upload_rate_entry.place(x=430, y=50)
+
+        connection_rate_label = tk.Label(text="Per download KiB/s").place(x=510, y=50)
+        connection_rate_entry = tk.Entry(window, width=10)
+        connection_rate_entry.place(x=630, y=50)
+
+        self.register_button = tk.Button(window, text="Register", width=10, state = DISABLED, command=lambda: self.run_task(self.register, name_entry.get().strip()))
+        self.register_button.place(x=0, y=75)
+
+        self.degister_button = tk.Button(window, text="Deregister", width=10, state = DISABLED, command=lambda: self.run_task(self.de_register))
+        self.degister_button.place(x=85, y=75)
+
+        self.publish_button = tk.Button(window, text="Publish", width=10, state = DISABLED, command=lambda: self.run_task(self.publish, file_name_entry.get().strip()))
+        self.publish_button.place(x=170, y=75)
+
+        self.remove_button = tk.Button(window, text="Remove", width=10, state = DISABLED, command=lambda: self.run_task(self.remove, file_name_entry.get().strip()))
+        self.remove_button.place(x=255, y=75)
+
+        self.retrieveall_button = tk.Button(window, text="Retrieve-all", width=10, state = DISABLED, command=lambda: self.run_task(self.retrieve_all))
+        self.retrieveall_button.place(x=340, y=75)
+
+        self.retrieveinfo_button = tk.Button(window, text="Retrieve-info", width=10, state = DISABLED, command=lambda: self.run_task(self.retrieve_info, name_entry.get().strip()))
+        self.retrieveinfo_button.place(x=425, y=75)
+
+        self.searchfile_button = tk.Button(window, text="Search-file", width=10, state = DISABLED, command=lambda: self.run_task(self.search_file, file_name_entry.get().split(',')[0].strip()))
+        self.searchfile_button.place(x=510, y=75)
+
+        self.download_button = tk.Button(window, text="Download", width=10, state = DISABLED, command=lambda: self.run_task(self.download, host_name_entry.get().strip(), port_name_entry.get().strip(), file_name_entry.get().split(',')[0].strip()))
+        self.download_button.place(x=595, y=75)
+
+        self.updatecontact_button = tk.Button(window, text="Update-contact", width=15, state = DISABLED, command=lambda: self.run_task(self.update_contact, name_entry.get().strip()))
+        self.updatecontact_button.place(x=680, y=75)
+
+        self.swarmdownload_button = tk.Button(window, text="Swarm-download", width=15, state = DISABLED, command=lambda: self.run_task(self.swarm_download, file_name_entry.get().split(',')[0].strip()))
+        self.swarmdownload_button.place(x=805, y=75)
+
+        self.setlimits_button = tk.Button(window, text="Set-limits", width=10, command=lambda: self.set_limits(upload_rate_entry.get().strip(), connection_rate_entry.get().strip()))
+        self.setlimits_button.place(x=710, y=46)
+
+        self.uploadstats_button = tk.Button(window, text="Upload-stats", width=10, command=lambda: self.upload_stats())
+        self.uploadstats_button.place(x=795, y=46)
+
+        self.cachestats_button = tk.Button(window, text="Cache-stats", width=10, command=lambda: self.cache_stats())
+        self.cachestats_button.place(x=880, y=46)
+
+        self.requeststats_button = tk.Button(window, text="Request-stats", width=10, command=lambda: self.request_stats())
+        self.requeststats_button.place(x=965, y=46)
+
+        self.connect_button = tk.Button(window, text="Connect to Server", width=15, command=lambda: self.connect(host_name_entry.get().strip(), port_name_entry.get().strip()))
+        self.connect_button.place(x=1066, y=75)
+
+    def run(self):
+        """
+        Run the GUI on the calling thread until its window is closed or the client is stopped by a signal, then stop the client.
+        """
+        self.window.after(GUI_POLL_INTERVAL, self.poll_ui_queue)
+        try:
+            self.window.mainloop()
+        finally:
+            self.stop_client()
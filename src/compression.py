@@ -0,0 +1,48 @@
+import lzma, os, zlib
+from typing import List
+
+from models.constants import COMPRESSION_CODECS, COMPRESSED_EXTENSIONS, COMPRESSIBLE_RATIO
+
+
+def choose_codec(file_name: str, accepted: List[str], level: int) -> str:
+    """
+    Codec used to send a file to a client accepting the `accepted` codecs, in its order of preference.
+    Files already compressed and uploads with a level of 0 are sent uncompressed.
+    """
+    if (level <= 0 or os.path.splitext(file_name)[1].lower() in COMPRESSED_EXTENSIONS):
+        return 'none'
+    for codec in accepted:
+        if (codec in COMPRESSION_CODECS):
+            return codec
+    return 'none'
+
+
+def is_compressible(sample: bytes) -> bool:
+    """Check if a sample of a file is worth compressing, with the fastest zlib level."""
+    return len(zlib.compress(sample, 1)) < len(sample) * COMPRESSIBLE_RATIO
+
+
+def create_compressor(codec: str, level: int):
+    """Returns an object compressing a stream with `compress` and `flush`, None for `none`."""
+    if (codec == 'zlib'):
+        return zlib.compressobj(level)
+    elif (codec == 'gzip'):
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS) # gzip header and trailer
+    elif (codec == 'lzma'):
+        return lzma.LZMACompressor(preset=level)
+    elif (codec == 'none'):
+        return None
+    raise ValueError('Unsupported compression {}'.format(codec))
+
+
+def create_decompressor(codec: str):
+    """Returns an object decompressing a stream with `decompress`, its `eof` is set at the end of the stream. None for `none`."""
+    if (codec == 'zlib'):
+        return zlib.decompressobj()
+    elif (codec == 'gzip'):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif (codec == 'lzma'):
+        return lzma.LZMADecompressor()
+    elif (codec == 'none'):
+        return None
+    raise ValueError('Unsupported compression {}'.format(codec))
@@ -1,9 +1,13 @@
-from typing import List, Tuple
+import sqlite3
+from itertools import groupby
+from typing import Iterator, List, Tuple
 
 from models.client_dto import ClientDto
 from models.file_dto import FileDto
+from models.constants import SEARCH_RESULT_LIMIT
 
 from data.store import Store, StoreException
+from data.registry_cache import RegistryCache
 
 
 class ClientStore(Store):
@@ -11,12 +15,51 @@ class ClientStore(Store):
     Client store class that persists data to the SQLite database or retrieves data 
     from the SQLite database. It implements the Repository pattern to achieve loose 
     coupling between the data access layer and controllers, along with the Unit of 
-    Work pattern to achieve atomic operations.
+    Work pattern to achieve atomic operations. Changes are written through to the
+    registry cache, if one is given, once the unit of work is committed.
     """
 
-    def __init__(self):
+    def __init__(self, registry: RegistryCache = None):
         super().__init__()
         self._cursor = self.connection.cursor()
+        self._registry = registry
+        self._registry_changes = []
+
+    def close(self):
+        """
+        Commit or roll back the unit of work and apply committed changes to the registry cache.
+        Changes of a nested store are handed to the store it is nested in.
+        """
+        if (self._parent is not None):
+            super().close()
+            if (self._complete and isinstance(self._parent, ClientStore)):
+                self._parent._registry_changes.extend(self._registry_changes)
+            self._registry_changes = []
+            return
+
+        if (self._registry is None):
+            super().close()
+            return
+
+        with self._registry.lock: # Cache is updated in the same order as commits
+            super().close()
+            if (self._complete):
+                for method, arg in self._registry_changes:
+                    getattr(self._registry, method)(arg)
+            self._registry_changes = []
+
+    def retrieve_registry(self) -> Tuple[List, List]:
+        """Retrieves all rows of the `clients` and `files` tables to load the registry cache."""
+        try:
+            self._cursor.execute(
+                "SELECT name, ip_address, udp_socket, tcp_socket FROM clients")
+            clients = self._cursor.fetchall()
+            self._cursor.execute(
+                "SELECT client_name, file_name, hash FROM files")
+            files = self._cursor.fetchall()
+            return clients, files
+        except Exception as err:
+            raise StoreException(err)
 
     def create_tables(self) -> None:
         """Create the `clients` and `files` tables in the SQLite database."""
@@ -32,6 +75,7 @@ class ClientStore(Store):
             files_sql = """CREATE TABLE files (
                             client_name TEXT REFERENCES clients (name),
                             file_name TEXT,
+                            hash TEXT,
                             PRIMARY KEY (client_name, file_name)
                         )"""
 
@@ -40,6 +84,54 @@ class ClientStore(Store):
         except Exception as err:
             raise StoreException(err)
 
+    def upgrade_tables(self) -> None:
+        """Add the columns added since the tables were created to the tables of an existing database."""
+        try:
+            self._cursor.execute("PRAGMA table_info(files)")
+            if ('hash' not in [column[1] for column in self._cursor.fetchall()]):
+                self._cursor.execute("ALTER TABLE files ADD COLUMN hash TEXT")
+        except sqlite3.OperationalError as err:
+            if ('duplicate column name' not in str(err)):
+                raise StoreException(err) # Otherwise added by another process since the check
+        except Exception as err:
+            raise StoreException(err)
+
+    def create_indexes(self) -> None:
+        """
+        Create the `file_name` index and the `files_fts` full-text index of the `files` table
+        if they do not exist. The full-text index is kept up to date by triggers on `files`
+        and is skipped if SQLite was built without FTS5.
+        """
+        try:
+            self._cursor.execute(
+                "CREATE INDEX IF NOT EXISTS files_file_name ON files (file_name)")
+
+            self._cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'files_fts'")
+            if (self._cursor.fetchone()):
+                return
+
+            try:
+                self._cursor.execute(
+                    "CREATE VIRTUAL TABLE files_fts USING fts5(file_name, client_name UNINDEXED, content = 'files')")
+            except Exception:
+                return # FTS5 not available, full-text search is disabled
+
+            insert_trigger_sql = """CREATE TRIGGER files_fts_insert AFTER INSERT ON files BEGIN
+                                    INSERT INTO files_fts (rowid, file_name, client_name) VALUES (new.rowid, new.file_name, new.client_name);
+                                END"""
+
+            delete_trigger_sql = """CREATE TRIGGER files_fts_delete AFTER DELETE ON files BEGIN
+                                    INSERT INTO files_fts (files_fts, rowid, file_name, client_name) VALUES ('delete', old.rowid, old.file_name, old.client_name);
+                                END"""
+
+            self._cursor.execute(insert_trigger_sql)
+            self._cursor.execute(delete_trigger_sql)
+            self._cursor.execute(
+                "INSERT INTO files_fts (files_fts) VALUES ('rebuild')") # Index files published before the index existed
+        except Exception as err:
+            raise StoreException(err)
+
     def __check_client_exists(self, client_name: str) -> bool:
         """Check if a client is registered/exists or not."""
         self._cursor.execute(
@@ -59,15 +151,6 @@ class ClientStore(Store):
         else:
             return False
 
-    def __check_file_exists(self, file_name: str) -> bool:
-        """Check if a file has been published/exists or not."""
-        self._cursor.execute(
-            "SELECT * FROM files WHERE file_name = (?)", (file_name, ))
-        if (self._cursor.fetchone()):
-            return True
-        else:
-            return False
-
     def register_client(self, client_dto: ClientDto) -> None:
         """
         Registers a new client's name, IP address, UDP socket, and TCP socket.
@@ -78,6 +161,7 @@ class ClientStore(Store):
             if (not self.__check_client_exists(client_dto.name)):
                 self._cursor.execute("INSERT INTO clients VALUES (?, ?, ?, ?)", (
                     client_dto.name, client_dto.ip_address, client_dto.udp_socket, client_dto.tcp_socket))
+                self._registry_changes.append(('register_client', client_dto))
             else:
                 raise Exception(
                     f"name {client_dto.name} already exists in the database")
@@ -95,6 +179,7 @@ class ClientStore(Store):
                 sql = "UPDATE clients SET ip_address = (?), udp_socket = (?), tcp_socket = (?) WHERE name = (?)"
                 self._cursor.execute(
                     sql, (client_dto.ip_address, client_dto.udp_socket, client_dto.tcp_socket, client_dto.name))
+                self._registry_changes.append(('update_client', client_dto))
             else:
                 raise Exception(
                     f"name {client_dto.name} does not exist in the database")
@@ -113,6 +198,7 @@ class ClientStore(Store):
                     "DELETE FROM files WHERE client_name = (?)", (name,))
                 self._cursor.execute(
                     "DELETE FROM clients WHERE name = (?)", (name,))
+                self._registry_changes.append(('deregister_client', name))
             else:
                 raise Exception(
                     f"name {name} is not registered/does not exist in the database")
@@ -127,10 +213,11 @@ class ClientStore(Store):
         """
         try:
             if (self.__check_client_exists(file_dto.client_name)):
-                file_tuples = [(file_dto.client_name, file)
+                file_tuples = [(file_dto.client_name, file, file_dto.hashes.get(file))
                                for file in file_dto.files]
                 self._cursor.executemany(
-                    "INSERT INTO files VALUES (?, ?)", file_tuples)
+                    "INSERT INTO files (client_name, file_name, hash) VALUES (?, ?, ?)", file_tuples)
+                self._registry_changes.append(('publish_files', file_dto))
             else:
                 raise Exception(
                     f"name {file_dto.client_name} is not registered/does not exist in the database")
@@ -150,6 +237,7 @@ class ClientStore(Store):
                                    for file in file_dto.files]
                     self._cursor.executemany(
                         "DELETE FROM files WHERE client_name = (?) AND file_name = (?)", file_tuples)
+                    self._registry_changes.append(('remove_files', file_dto))
                 else:
                     raise Exception(
                         f"trying to remove file(s) {file_dto.files} that do not exist in the database")
@@ -159,33 +247,38 @@ class ClientStore(Store):
         except Exception as err:
             raise StoreException(err)
 
-    def retrieve_all(self, client_name: str) -> List:
+    def retrieve_all(self, client_name: str, after: str = None, limit: int = -1) -> Iterator[Tuple]:
         """
         Retrieves name, IP address, TCP socket and file list for all clients.
-        Implements `RETRIEVE-ALL` and returns None for `RETRIEVE` and 
+        Implements `RETRIEVE-ALL` and returns an iterator for `RETRIEVE` and 
         StoreException for `RETRIEVE-ERROR` (Specification 2.3).
+        Clients are read with a single query ordered by name and yielded one at a time,
+        so the iterator must be consumed before the store is closed. Only the first `limit`
+        clients whose name comes after `after` are retrieved, to read the clients page by page.
         """
         try:
             if (self.__check_client_exists(client_name)):
-                self._cursor.execute(
-                    "SELECT name, ip_address, tcp_socket FROM clients")
-                clients = self._cursor.fetchall()
-                all_info = []
-                for client in clients:
-                    self._cursor.execute(
-                        "SELECT file_name FROM clients LEFT JOIN files ON name = client_name WHERE name = (?)", (client[0],))
-                    files = self._cursor.fetchall()
-                    files_info = [file[0]
-                                  for file in files if not file[0] is None]
-                    client += (files_info,)
-                    all_info.append(client)
-                return all_info
+                sql = """SELECT name, ip_address, tcp_socket, file_name
+                        FROM (SELECT * FROM clients WHERE name > (?) ORDER BY name LIMIT (?))
+                        LEFT JOIN files ON name = client_name ORDER BY name"""
+                self._cursor.execute(sql, (after if after is not None else '', limit))
+                return self.__group_files(self._cursor)
             else:
                 raise Exception(
                     f"name {client_name} is not registered/does not exist in the database")
         except Exception as err:
             raise StoreException(err)
 
+    def __group_files(self, rows) -> Iterator[Tuple]:
+        """Group the rows of consecutive files belonging to the same client into one client tuple."""
+        try:
+            for name, client_rows in groupby(rows, key=lambda row: row[0]):
+                first_row = next(client_rows)
+                files_info = [row[3] for row in (first_row, *client_rows) if not row[3] is None]
+                yield (name, first_row[1], first_row[2], files_info)
+        except Exception as err:
+            raise StoreException(err)
+
     def retrieve_info(self, client_name: str, search_name: str) -> Tuple:
         """
         Retrieves a single client's name, IP address, TCP socket and file list.
@@ -210,18 +303,39 @@ class ClientStore(Store):
         except Exception as err:
             raise StoreException(err)
 
-    def search_file(self, client_name: str, file_name: str) -> List:
+    def search_file(self, client_name: str, file_name: str, mode: str = 'EXACT', limit: int = SEARCH_RESULT_LIMIT, offset: int = 0) -> List:
         """
-        Searches for a specific file and responds with the associated client information.
+        Searches for files and responds with the associated client information, file name and hash advertised by the client.
+        `mode` is `EXACT` for a file name, `PREFIX` for file names starting with `file_name`,
+        `GLOB` for a wildcard pattern or `FULLTEXT` for file names containing all words of `file_name`.
+        At most `limit` files are returned, skipping the first `offset` files to read the results page by page.
         Implements `SEARCH-FILE` and returns None for `SEARCH-FILE` and 
         StoreException for `SEARCH-ERROR` (Specification 2.3).
         """
         try:
             if (self.__check_client_exists(client_name)):
-                if (self.__check_file_exists(file_name)):
-                    sql = "SELECT name, ip_address, tcp_socket FROM files INNER JOIN clients ON client_name = name WHERE file_name = (?)"
-                    self._cursor.execute(sql, (file_name,))
-                    files = self._cursor.fetchall()
+                select_sql = "SELECT name, ip_address, tcp_socket, files.file_name, files.hash FROM files INNER JOIN clients ON files.client_name = name"
+                if (mode == 'EXACT'):
+                    self._cursor.execute(
+                        select_sql + " WHERE files.file_name = (?) ORDER BY name LIMIT (?) OFFSET (?)", (file_name, limit, offset))
+                elif (mode == 'PREFIX'):
+                    self._cursor.execute(
+                        select_sql + " WHERE files.file_name >= (?) AND files.file_name < (?) ORDER BY files.file_name, name LIMIT (?) OFFSET (?)",
+                        (file_name, file_name + '\U0010ffff', limit, offset))
+                elif (mode == 'GLOB'):
+                    self._cursor.execute(
+                        select_sql + " WHERE files.file_name GLOB (?) ORDER BY files.file_name, name LIMIT (?) OFFSET (?)", (file_name, limit, offset))
+                elif (mode == 'FULLTEXT'):
+                    query = ' '.join('"{}"'.format(word.replace('"', '""')) for word in file_name.split()) # Match words literally
+                    self._cursor.execute(
+                        select_sql + " INNER JOIN files_fts ON files_fts.rowid = files.rowid WHERE files_fts MATCH (?) ORDER BY files_fts.rank, files.rowid LIMIT (?) OFFSET (?)",
+                        (query, limit, offset))
+                else:
+                    raise Exception(
+                        f"search mode {mode} is not supported")
+
+                files = self._cursor.fetchall()
+                if (files or offset > 0): # Past the first page there may be no files left
                     return files
                 else:
                     raise Exception(
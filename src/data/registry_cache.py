@@ -0,0 +1,143 @@
+import threading, bisect
+from collections import defaultdict
+from typing import Iterator, List, Tuple
+
+from models.client_dto import ClientDto
+from models.file_dto import FileDto
+from models.constants import SEARCH_RESULT_LIMIT
+
+from data.store import StoreException
+
+
+class RegistryCache():
+    """
+    In-memory copy of the `clients` and `files` tables answering read requests without
+    querying the SQLite database. It is loaded once from the database and kept up to
+    date by `ClientStore`, which applies the changes of a unit of work after committing
+    them (write-through). It can be used in place of a `ClientStore` for reads.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.clients = {} # name -> ClientDto
+        self.client_names = [] # sorted names, to read clients page by page
+        self.client_files = {} # name -> set of file names
+        self.file_holders = defaultdict(set) # file name -> set of client names
+        self.file_hashes = {} # (client name, file name) -> hash advertised by the client
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type_, value, traceback):
+        pass
+
+    def complete(self):
+        pass
+
+    def load(self, clients: List[Tuple], files: List[Tuple]) -> None:
+        """Replace the cache content with rows of the `clients` and `files` tables."""
+        with self.lock:
+            self.clients = {}
+            self.client_files = {}
+            self.file_holders = defaultdict(set)
+            self.file_hashes = {}
+            for name, ip_address, udp_socket, tcp_socket in clients:
+                self.clients[name] = ClientDto(name, ip_address, udp_socket, tcp_socket)
+                self.client_files[name] = set()
+            self.client_names = sorted(self.clients) # Sorted once instead of inserting each name in order
+            for client_name, file_name, file_hash in files:
+                self.publish_files(FileDto(client_name, [file_name], {file_name: file_hash}))
+
+    def register_client(self, client_dto: ClientDto) -> None:
+        with self.lock:
+            self.clients[client_dto.name] = client_dto
+            self.client_files[client_dto.name] = set()
+            bisect.insort(self.client_names, client_dto.name)
+
+    def update_client(self, client_dto: ClientDto) -> None:
+        with self.lock:
+            self.clients[client_dto.name] = client_dto
+
+    def deregister_client(self, name: str) -> None:
+        with self.lock:
+            self.remove_files(FileDto(name, list(self.client_files[name])))
+            del self.clients[name]
+            del self.client_files[name]
+            del self.client_names[bisect.bisect_left(self.client_names, name)]
+
+    def publish_files(self, file_dto: FileDto) -> None:
+        with self.lock:
+            for file_name in file_dto.files:
+                self.client_files[file_dto.client_name].add(file_name)
+                self.file_holders[file_name].add(file_dto.client_name)
+                self.file_hashes[(file_dto.client_name, file_name)] = file_dto.hashes.get(file_name)
+
+    def remove_files(self, file_dto: FileDto) -> None:
+        with self.lock:
+            for file_name in file_dto.files:
+                self.client_files[file_dto.client_name].discard(file_name)
+                self.file_holders[file_name].discard(file_dto.client_name)
+                self.file_hashes.pop((file_dto.client_name, file_name), None)
+                if (not self.file_holders[file_name]):
+                    del self.file_holders[file_name]
+
+    def __client_info(self, name: str) -> Tuple:
+        client_dto = self.clients[name]
+        return (name, client_dto.ip_address, client_dto.tcp_socket, sorted(self.client_files[name]))
+
+    def retrieve_all(self, client_name: str, after: str = None, limit: int = -1) -> Iterator[Tuple]:
+        """Same as `ClientStore.retrieve_all`, answered from memory."""
+        with self.lock:
+            if (client_name not in self.clients):
+                raise StoreException(
+                    f"name {client_name} is not registered/does not exist in the database")
+            start = bisect.bisect_right(self.client_names, after) if after is not None else 0
+            end = start + limit if limit >= 0 else len(self.client_names)
+            return iter([self.__client_info(name) for name in self.client_names[start:end]])
+
+    def retrieve_info(self, client_name: str, search_name: str) -> Tuple:
+        """Same as `ClientStore.retrieve_info`, answered from memory."""
+        with self.lock:
+            if (client_name not in self.clients or search_name not in self.clients):
+                raise StoreException(
+                    f"name {client_name} or {search_name} is not registered/does not exist in the database")
+            return self.__client_info(search_name)
+
+    def search_file(self, client_name: str, file_name: str, mode: str = 'EXACT', limit: int = SEARCH_RESULT_LIMIT, offset: int = 0) -> List:
+        """Same as `ClientStore.search_file`, answered from memory for the `EXACT` mode only."""
+        with self.lock:
+            if (mode != 'EXACT'):
+                raise StoreException(
+                    f"search mode {mode} is not supported by the registry cache")
+            if (client_name not in self.clients):
+                raise StoreException(
+                    f"name {client_name} is not registered/does not exist in the database")
+            if (file_name not in self.file_holders and offset == 0):
+                raise StoreException(
+                    f"file name {file_name} does not exist in the database")
+
+            holders = sorted(self.file_holders.get(file_name, ()))[offset:offset + limit]
+            return [(name, self.clients[name].ip_address, self.clients[name].tcp_socket, file_name, self.file_hashes[(name, file_name)])
+                for name in holders]
+
+    def check_consistency(self, clients: List[Tuple], files: List[Tuple]) -> List[str]:
+        """
+        Compare the cache with rows of the `clients` and `files` tables.
+        Returns a description of each difference found, empty if the cache is consistent.
+        """
+        differences = []
+        with self.lock:
+            db_clients = {row[0]: row[1:] for row in clients}
+            cached_clients = {name: (dto.ip_address, dto.udp_socket, dto.tcp_socket) for name, dto in self.clients.items()}
+            for name in sorted(db_clients.keys() | cached_clients.keys()):
+                if (db_clients.get(name) != cached_clients.get(name)):
+                    differences.append(f"client {name}: database {db_clients.get(name)}, cache {cached_clients.get(name)}")
+
+            db_files = set(files)
+            cached_files = {(name, file_name, self.file_hashes[(name, file_name)])
+                for name, file_names in self.client_files.items() for file_name in file_names}
+            for client_name, file_name, file_hash in sorted(db_files - cached_files, key=str):
+                differences.append(f"file {file_name} of {client_name} (hash {file_hash}) missing from cache")
+            for client_name, file_name, file_hash in sorted(cached_files - db_files, key=str):
+                differences.append(f"file {file_name} of {client_name} (hash {file_hash}) missing from database")
+        return differences
@@ -0,0 +1,114 @@
+import threading, time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from models.constants import REQUEST_CACHE_CAPACITY, REQUEST_CACHE_TTL
+
+from data.request_store import RequestStore
+
+
+class RequestCache():
+    """
+    Bounded cache of the requests received from each client address, keyed by address and RQ#.
+    It stores the response sent for each request so a retransmitted request, whose response
+    was lost, is answered again instead of being handled twice. Entries older than `ttl`
+    seconds expire and the least recently received entry is evicted past `capacity` entries.
+    """
+
+    def __init__(self, capacity: int = REQUEST_CACHE_CAPACITY, ttl: float = REQUEST_CACHE_TTL):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict() # (client address, RQ#) -> [received at, response]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def begin(self, client_addr: str, rq_num: int) -> Tuple[bool, Optional[bytes]]:
+        """
+        Record a request about to be handled. Returns True and the response already sent for it
+        if the request is a duplicate, the response is None if the request is still being handled.
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.__expire(now)
+            entry = self.entries.get((client_addr, rq_num))
+            if (entry is not None):
+                self.hits += 1
+                return True, entry[1]
+
+            self.misses += 1
+            self.entries[(client_addr, rq_num)] = [now, None]
+            if (len(self.entries) > self.capacity):
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            return False, None
+
+    def save_response(self, client_addr: str, rq_num: int, response: bytes) -> None:
+        """Store the response sent for a request."""
+        with self.lock:
+            entry = self.entries.get((client_addr, rq_num))
+            if (entry is not None):
+                entry[1] = response
+
+    def discard(self, client_addr: str, rq_num: int) -> None:
+        """Forget a request that failed so a retransmission is handled again."""
+        with self.lock:
+            self.entries.pop((client_addr, rq_num), None)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def __expire(self, now: float) -> None:
+        """Remove entries older than the TTL, the oldest entries are first."""
+        while (self.entries):
+            received_at = next(iter(self.entries.values()))[0]
+            if (now - received_at < self.ttl):
+                break
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+
+class SharedRequestCache(RequestCache):
+    """
+    Request cache saved in the SQLite database, so duplicate requests are recognized and answered
+    by every server process sharing it. Entries expire after `ttl` seconds, the capacity is not bounded.
+    """
+
+    def __init__(self, ttl: float = REQUEST_CACHE_TTL):
+        super().__init__(ttl=ttl)
+        self.last_expired = 0
+
+    def begin(self, client_addr: str, rq_num: int) -> Tuple[bool, Optional[bytes]]:
+        now = time.time() # Compared between processes
+        with RequestStore() as db:
+            if (now - self.last_expired >= self.ttl):
+                self.last_expired = now
+                expired = db.delete_expired(now - self.ttl)
+            else:
+                expired = 0
+            is_duplicate, response = db.record_request(client_addr, rq_num, now)
+            db.complete()
+
+        with self.lock:
+            self.evictions += expired
+            if (is_duplicate):
+                self.hits += 1
+            else:
+                self.misses += 1
+        return is_duplicate, response
+
+    def save_response(self, client_addr: str, rq_num: int, response: bytes) -> None:
+        with RequestStore() as db:
+            db.save_response(client_addr, rq_num, response)
+            db.complete()
+
+    def discard(self, client_addr: str, rq_num: int) -> None:
+        with RequestStore() as db:
+            db.delete_request(client_addr, rq_num)
+            db.complete()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
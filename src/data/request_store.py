@@ -0,0 +1,82 @@
+from typing import Optional, Tuple
+
+from data.store import Store, StoreException
+
+
+class RequestStore(Store):
+    """
+    Request store class that persists the RQ# received from each client address and the
+    response sent for it to the SQLite database, so duplicate requests are recognized and
+    answered by every server process sharing it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._cursor = self.connection.cursor()
+
+    def create_tables(self) -> None:
+        """Create the `requests` table in the SQLite database if it does not exist."""
+        try:
+            requests_sql = """CREATE TABLE IF NOT EXISTS requests (
+                            client_addr TEXT,
+                            rq_num INTEGER,
+                            received_at REAL,
+                            response BLOB,
+                            PRIMARY KEY (client_addr, rq_num)
+                        )"""
+
+            self._cursor.execute(requests_sql)
+            self._cursor.execute(
+                "CREATE INDEX IF NOT EXISTS requests_received_at ON requests (received_at)")
+        except Exception as err:
+            raise StoreException(err)
+
+    def drop_tables(self) -> None:
+        """Drop the `requests` table, the RQ# of a previous run are not kept."""
+        try:
+            self._cursor.execute("DROP TABLE IF EXISTS requests")
+        except Exception as err:
+            raise StoreException(err)
+
+    def record_request(self, client_addr: str, rq_num: int, received_at: float) -> Tuple[bool, Optional[bytes]]:
+        """
+        Saves the RQ# received from a client address. Returns True and the response saved
+        for it if the RQ# was already saved for that address, the response is None if the
+        request is still being handled.
+        """
+        try:
+            self._cursor.execute(
+                "INSERT OR IGNORE INTO requests VALUES (?, ?, ?, NULL)", (client_addr, rq_num, received_at))
+            if (self._cursor.rowcount == 1):
+                return False, None
+
+            self._cursor.execute(
+                "SELECT response FROM requests WHERE client_addr = (?) AND rq_num = (?)", (client_addr, rq_num))
+            return True, self._cursor.fetchone()[0]
+        except Exception as err:
+            raise StoreException(err)
+
+    def save_response(self, client_addr: str, rq_num: int, response: bytes) -> None:
+        """Saves the response sent for a client's RQ#."""
+        try:
+            self._cursor.execute(
+                "UPDATE requests SET response = (?) WHERE client_addr = (?) AND rq_num = (?)", (response, client_addr, rq_num))
+        except Exception as err:
+            raise StoreException(err)
+
+    def delete_request(self, client_addr: str, rq_num: int) -> None:
+        """Deletes a client's RQ# so a retransmission is handled again."""
+        try:
+            self._cursor.execute(
+                "DELETE FROM requests WHERE client_addr = (?) AND rq_num = (?)", (client_addr, rq_num))
+        except Exception as err:
+            raise StoreException(err)
+
+    def delete_expired(self, received_before: float) -> int:
+        """Deletes the RQ# received before a time. Returns the number of RQ# deleted."""
+        try:
+            self._cursor.execute(
+                "DELETE FROM requests WHERE received_at < (?)", (received_before,))
+            return self._cursor.rowcount
+        except Exception as err:
+            raise StoreException(err)
@@ -1,4 +1,6 @@
-import sqlite3
+import sqlite3, threading
+
+from models.constants import DB_BUSY_TIMEOUT, DB_CACHE_SIZE, DB_MMAP_SIZE
 
 
 class StoreException(Exception):
@@ -7,13 +9,68 @@ class StoreException(Exception):
         self.errors = errors
 
 
+class ConnectionPool():
+    """
+    Keeps one open connection to the SQLite database per thread, so stores opened
+    for each request reuse it instead of connecting to the database every time.
+    The database uses write-ahead logging so readers do not block the writer when
+    several server processes share it.
+    """
+
+    def __init__(self, database: str):
+        self.database = database
+        self._local = threading.local()
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Return the current thread's connection, opening it on first use."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.database, timeout=DB_BUSY_TIMEOUT)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('PRAGMA cache_size=-{}'.format(DB_CACHE_SIZE))
+            connection.execute('PRAGMA mmap_size={}'.format(DB_MMAP_SIZE))
+            self._local.connection = connection
+        return connection
+
+    def open_stores(self) -> list:
+        """Return the stores currently open on the current thread, outermost first."""
+        if not hasattr(self._local, 'stores'):
+            self._local.stores = []
+        return self._local.stores
+
+    def close_connection(self) -> None:
+        """Close the current thread's connection if it is open."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            self._local.connection = None
+            connection.close()
+
+
+connection_pool = ConnectionPool('clients.db')
+
+
 class Store():
     def __init__(self):
-        """Open a connection to the SQLite database."""
+        """
+        Get the current thread's connection to the SQLite database from the pool.
+        A store opened while another one is open on the same thread is nested in its
+        unit of work: it uses a savepoint which is released or rolled back on close,
+        and its changes are only committed with the outermost store.
+        """
         try:
-            self.connection = sqlite3.connect('clients.db')
+            self.connection = connection_pool.get_connection()
+            stores = connection_pool.open_stores()
+            self._parent = stores[-1] if stores else None
+            self._savepoint = None
+            if self._parent is not None:
+                if not self.connection.in_transaction:
+                    self.connection.execute('BEGIN') # Releasing the savepoint must not commit
+                self._savepoint = 'store_{}'.format(len(stores))
+                self.connection.execute('SAVEPOINT {}'.format(self._savepoint))
+            stores.append(self)
         except Exception as e:
-            raise StoreException(*e.args, **e.kwargs)
+            raise StoreException(*e.args)
         self._complete = False
 
     def __enter__(self):
@@ -26,16 +83,20 @@ class Store():
         self._complete = True
 
     def close(self):
+        """Commit or roll back the unit of work and return the connection to the pool."""
         if self.connection:
             try:
-                if self._complete:
+                if self._savepoint is not None:
+                    if not self._complete:
+                        self.connection.execute('ROLLBACK TO {}'.format(self._savepoint))
+                    self.connection.execute('RELEASE {}'.format(self._savepoint))
+                elif self._complete:
                     self.connection.commit()
                 else:
                     self.connection.rollback()
             except Exception as e:
+                connection_pool.close_connection() # Connection may be unusable, open a new one next time
                 raise StoreException(*e.args)
             finally:
-                try:
-                    self.connection.close()
-                except Exception as e:
-                    raise StoreException(*e.args)
+                connection_pool.open_stores().remove(self)
+                self.connection = None
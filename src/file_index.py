@@ -0,0 +1,141 @@
+import hashlib, json, os, threading
+from typing import List, Optional, Tuple
+
+from models.constants import PUBLIC_FOLDER, HASH_INDEX_FILE, HASH_INDEX_INTERVAL, HASH_CHUNK_SIZE, \
+    PARTIAL_FILE_SUFFIX, PROGRESS_FILE_SUFFIX
+
+
+def chunk_hasher():
+    """Hash object computing the hash of a chunk received in several parts."""
+    return hashlib.sha256()
+
+
+def hash_chunk(chunk: bytes) -> str:
+    hasher = chunk_hasher()
+    hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def hash_root(chunk_hashes: List[str]) -> str:
+    """Hash of a whole file, computed from the hashes of its chunks so a list of chunk hashes can be checked against it."""
+    return hashlib.sha256(b''.join(bytes.fromhex(chunk_hash) for chunk_hash in chunk_hashes)).hexdigest()
+
+
+def hash_file(path: str) -> Tuple[str, List[str]]:
+    """Returns the hash of the file and the hash of each of its chunks of `HASH_CHUNK_SIZE` bytes."""
+    chunk_hashes = []
+    with open(path, 'rb') as file:
+        while (True):
+            chunk = file.read(HASH_CHUNK_SIZE)
+            if (not chunk):
+                break
+            chunk_hashes.append(hash_chunk(chunk))
+    return hash_root(chunk_hashes), chunk_hashes
+
+
+class FileIndex():
+    """
+    Index of the hashes of the files in the public folder, saved to `HASH_INDEX_FILE` so they are not
+    computed again when the client restarts. Each entry keeps the size and modification time of the file
+    it was computed from, a file is only hashed again once it changed. A background thread keeps the
+    index up to date, `get` hashes a file right away if its entry is missing or out of date while
+    `get_cached` leaves it to the background thread.
+    """
+
+    def __init__(self, folder: str = PUBLIC_FOLDER, index_file: str = HASH_INDEX_FILE):
+        self.folder = folder
+        self.index_file = index_file
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.wakeup = threading.Event() # Set to refresh the index before the next interval
+        self.entries = {} # file name -> {'SIZE', 'MTIME', 'HASH', 'CHUNK_HASHES'}
+
+        try:
+            with open(self.index_file, 'r') as file:
+                self.entries = json.load(file)
+        except (OSError, ValueError):
+            pass # No index saved yet, every file is hashed
+
+    def start(self, interval: float = HASH_INDEX_INTERVAL) -> None:
+        """Refresh the index now and then every `interval` seconds on a new thread."""
+        refresh_thread = threading.Thread(target=self.__refresh_loop, args=(interval,), daemon=True)
+        refresh_thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.wakeup.set()
+
+    def __refresh_loop(self, interval: float) -> None:
+        while (not self.stopped.is_set()):
+            self.wakeup.clear()
+            self.refresh()
+            self.wakeup.wait(interval)
+
+    def __is_current(self, entry: Optional[dict], stat: os.stat_result) -> bool:
+        return entry is not None and entry['SIZE'] == stat.st_size and entry['MTIME'] == stat.st_mtime_ns
+
+    def get(self, file_name: str) -> Optional[dict]:
+        """Returns the up to date entry of a file, None if the file does not exist."""
+        try:
+            stat = os.stat(os.path.join(self.folder, file_name))
+        except OSError:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(file_name)
+        if (self.__is_current(entry, stat)):
+            return entry
+
+        try:
+            file_hash, chunk_hashes = hash_file(os.path.join(self.folder, file_name))
+        except OSError:
+            return None
+        entry = {'SIZE': stat.st_size, 'MTIME': stat.st_mtime_ns, 'HASH': file_hash, 'CHUNK_HASHES': chunk_hashes}
+        with self.lock:
+            self.entries[file_name] = entry
+        return entry
+
+    def get_cached(self, file_name: str) -> Optional[dict]:
+        """
+        Returns the entry of a file if it is up to date, without hashing the file. Otherwise returns None
+        and wakes up the background thread to hash it.
+        """
+        try:
+            stat = os.stat(os.path.join(self.folder, file_name))
+        except OSError:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(file_name)
+        if (self.__is_current(entry, stat)):
+            return entry
+
+        self.wakeup.set()
+        return None
+
+    def refresh(self) -> None:
+        """Hash the files added or changed since the last refresh, forget the files removed and save the index."""
+        try:
+            file_names = [entry.name for entry in os.scandir(self.folder) if entry.is_file()
+                and not entry.name.endswith((PARTIAL_FILE_SUFFIX, PROGRESS_FILE_SUFFIX))] # Skip downloads in progress
+        except OSError:
+            return
+
+        with self.lock:
+            before = dict(self.entries)
+        for file_name in file_names:
+            self.get(file_name)
+
+        with self.lock:
+            for file_name in set(self.entries) - set(file_names):
+                del self.entries[file_name]
+            if (self.entries == before):
+                return
+            entries = dict(self.entries)
+
+        try:
+            with open(self.index_file + '.tmp', 'w') as file:
+                json.dump(entries, file)
+            os.replace(self.index_file + '.tmp', self.index_file)
+        except OSError:
+            pass # Index is saved at the next refresh
@@ -0,0 +1,76 @@
+import socket
+
+from message import message as msg_lib, ParsedMessage
+from models.constants import STREAM_BUFFER_SIZE
+
+
+class FrameReader():
+    """
+    Reads the messages and raw bytes sent on a TCP socket. TCP delivers a stream of bytes, a single `recv`
+    may return part of a message or several messages at once, so the bytes received are kept in a buffer
+    until a whole message is received and the bytes received past it are kept for the next read.
+    The buffer is allocated once and received into with `recv_into`, it only grows for a larger message.
+    """
+
+    def __init__(self, sock: socket.socket, buffer_size: int = STREAM_BUFFER_SIZE):
+        self.sock = sock
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0 # First byte received and not read yet
+        self.end = 0 # Last byte received
+
+    def read_message(self) -> ParsedMessage:
+        """Returns the next message, binary or text. Raises ConnectionError if the connection is closed before."""
+        if (self.start == self.end):
+            self.__receive(1)
+        header_size = msg_lib.header_size(self.buffer[self.start:self.start + 1])
+        if (self.end - self.start < header_size):
+            self.__receive(header_size)
+        start = self.start
+        method, headers = msg_lib.parse_header(self.view[start:start + header_size])
+
+        message_size = header_size + headers['content-length']
+        if (self.end - start < message_size):
+            self.__receive(message_size)
+            start = self.start # Moved to the start of the buffer to receive the body
+        self.start = start + message_size
+
+        return ParsedMessage(method, headers, msg_lib.parse_body(self.view[start + header_size:start + message_size]))
+
+    def read_bytes(self, max_size: int) -> memoryview:
+        """
+        Returns at most `max_size` raw bytes following the messages read, the bytes already received first.
+        The bytes returned are only valid until the next read. Raises ConnectionError if the connection is closed.
+        """
+        if (self.start == self.end):
+            self.start = self.end = 0
+            received = self.sock.recv_into(self.view, min(max_size, len(self.buffer)))
+            if (received == 0):
+                raise ConnectionError('Connection closed')
+            return self.view[:received]
+
+        size = min(max_size, self.end - self.start)
+        self.start += size
+        return self.view[self.start - size:self.start]
+
+    def __receive(self, size: int) -> None:
+        """Receive until at least `size` bytes are in the buffer, moving them to its start or growing it first if they do not fit."""
+        if (self.end - self.start >= size):
+            return
+
+        if (self.start + size > len(self.buffer)):
+            pending = self.end - self.start
+            if (size > len(self.buffer)):
+                buffer = bytearray(max(size, 2 * len(self.buffer)))
+                buffer[:pending] = self.view[self.start:self.end]
+                self.buffer = buffer
+                self.view = memoryview(self.buffer)
+            else:
+                self.view[:pending] = self.view[self.start:self.end] # memoryview copies overlapping bytes safely
+            self.start, self.end = 0, pending
+
+        while (self.end - self.start < size):
+            received = self.sock.recv_into(self.view[self.end:])
+            if (received == 0):
+                raise ConnectionError('Connection closed with {} bytes of a message left to receive'.format(size - (self.end - self.start)))
+            self.end += received
@@ -1,6 +1,6 @@
-import json
+import json, struct
 
-from models.constants import FORMAT, METHOD_HEADER_SIZE, LENGTH_HEADER_SIZE, TYPE_HEADER_SIZE, ENCODING_HEADER_SIZE
+from models.constants import FORMAT, HEADER_SIZE, METHOD_HEADER_SIZE, LENGTH_HEADER_SIZE, TYPE_HEADER_SIZE, ENCODING_HEADER_SIZE, TEXT_CONTENT_TYPE, BINARY_CONTENT_TYPE
 
 STATUS_CODES = {
     '200': 'OK', 
@@ -13,15 +13,57 @@ STATUS_CODES = {
     '503': 'Service Unavailable'
 }
 
+# Method codes of the binary header, status codes of responses are sent as is
+METHOD_CODES = {
+    'REGISTER': 1,
+    'DE-REGISTER': 2,
+    'PUBLISH': 3,
+    'REMOVE': 4,
+    'RETRIEVE-ALL': 5,
+    'RETRIEVE-INFO': 6,
+    'SEARCH-FILE': 7,
+    'UPDATE-CONTACT': 8,
+    'DOWNLOAD': 9,
+    'FILE': 10,
+    'FILE-END': 11,
+    'BATCH': 12,
+    'FILE-STREAM': 13
+}
+METHOD_NAMES = {code: method for method, code in METHOD_CODES.items()}
+
+# Binary header: magic byte, header version, method or status code, content length
+BINARY_MAGIC = 0xB5 # Never the first byte of a text header, which is ASCII
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('!BBHI')
+
+# Offsets of the values in the fixed length text header
+LENGTH_OFFSET = METHOD_HEADER_SIZE + len('\r\nContent-Length: ')
+TYPE_OFFSET = LENGTH_OFFSET + LENGTH_HEADER_SIZE + len('\r\nContent-Type: ')
+ENCODING_OFFSET = TYPE_OFFSET + TYPE_HEADER_SIZE + len('\r\nContent-Encoding: ')
+
+class ParsedMessage:
+    """
+    Method (or status), headers and body of a message parsed by `Message.parse`.
+    """
+    __slots__ = ('method', 'headers', 'body')
+
+    def __init__(self, method: str, headers: dict, body):
+        self.method = method
+        self.headers = headers
+        self.body = body
+
 class Message:
 
     def __init__(self):
         pass
 
-    def create_request(self, method: str, payload):
+    def create_request(self, method: str, payload, content_type: str = TEXT_CONTENT_TYPE):
         """
         Function to create the request to send to the server
         """
+        if (content_type == BINARY_CONTENT_TYPE):
+            return self.create_binary(METHOD_CODES[method], payload)
+
         body = json.dumps(payload, indent=2)
         content_length = len(body.encode(FORMAT))
         content_type = 'text/json'
@@ -32,10 +74,13 @@ class Message:
 
         return request.encode(FORMAT)
 
-    def create_response(self, payload, status_code: int):
+    def create_response(self, payload, status_code: int, content_type: str = TEXT_CONTENT_TYPE):
         """
         Function to create the response of the server to the user
         """
+        if (content_type == BINARY_CONTENT_TYPE):
+            return self.create_binary(status_code, payload)
+
         body = json.dumps(payload, indent=2)
         content_length = len(body.encode(FORMAT))
         content_type = 'text/json'
@@ -49,35 +94,74 @@ class Message:
 
         return response.encode(FORMAT)
 
-    def extract_method(self, message: str):
+    def create_binary(self, code: int, payload):
+        """
+        Function to create a message with the binary header, the body is JSON without whitespace
+        """
+        body = json.dumps(payload, separators=(',', ':')).encode(FORMAT)
+
+        return BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, code, len(body)) + body
+
+    def is_binary(self, message: bytes):
+        """
+        Function to check if a message has the binary header
+        """
+        return len(message) > 0 and message[0] == BINARY_MAGIC
+
+    def header_size(self, message):
         """
-        Function to extract the function called by the user
+        Function to get the size of the header at the start of a message, binary or text
         """
-        method = message.split('\r\n')[0].strip()
+        return BINARY_HEADER.size if self.is_binary(message) else HEADER_SIZE
 
-        return method.lower().replace('-', '_')
-        
-    def extract_headers(self, message: str):
+    def parse_header(self, header):
         """
-        Function to extract information from the response such as content length, content type and content encoding
+        Function to extract the method (or status) and headers from the header of a message in bytes,
+        bytearray or memoryview. The fixed length text header is read at the offset of each value.
         """
-        message_split = message.split('\r\n')
-        matches = [message.split(':')[1].strip() for message in message_split[1:4]]    
-        content_dict = {
-            "content-length": int(matches[0]),
-            "content-type": matches[1],
-            "content-encoding": matches[2]
+        if (self.is_binary(header)):
+            magic, version, code, content_length = BINARY_HEADER.unpack_from(header)
+            if (version != BINARY_VERSION):
+                raise ValueError('Unsupported binary header version {}'.format(version))
+
+            method = METHOD_NAMES.get(code, str(code))
+            content_type = BINARY_CONTENT_TYPE
+            content_encoding = FORMAT
+        else:
+            header = str(header[:HEADER_SIZE], FORMAT)
+            if (not header.endswith('\r\n\r\n')):
+                raise ValueError('Invalid message header')
+
+            method = header[:METHOD_HEADER_SIZE].rstrip()
+            content_length = int(header[LENGTH_OFFSET:LENGTH_OFFSET + LENGTH_HEADER_SIZE])
+            content_type = header[TYPE_OFFSET:TYPE_OFFSET + TYPE_HEADER_SIZE].rstrip()
+            content_encoding = header[ENCODING_OFFSET:ENCODING_OFFSET + ENCODING_HEADER_SIZE].rstrip()
+
+        headers = {
+            "content-length": content_length,
+            "content-type": content_type,
+            "content-encoding": content_encoding
         }
-        
-        return content_dict
 
-    def extract_body(self, message: str):
+        return method.lower().replace('-', '_'), headers
+
+    def parse_body(self, body):
+        """
+        Function to decode the JSON body of a message in bytes, bytearray or memoryview
         """
-        Function to extract the body of the response and request
+        return json.loads(str(body, FORMAT))
+
+    def parse(self, message) -> ParsedMessage:
         """
-        body = message.split('\r\n\r\n')[1]
-        
-        return json.loads(body)
+        Function to parse a whole message in bytes, bytearray or memoryview in a single pass, binary or text.
+        The header is read in place and only the body is handed to the JSON decoder, without copying it
+        if the message is a memoryview.
+        """
+        header_size = self.header_size(message)
+        method, headers = self.parse_header(message[:header_size])
+        body = self.parse_body(message[header_size:header_size + headers['content-length']])
+
+        return ParsedMessage(method, headers, body)
 
 
 message = Message()
\ No newline at end of file
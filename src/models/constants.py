@@ -1,9 +1,78 @@
+import os
+
 BUFFER_SIZE = 4096
 
+MAX_WORKERS = 8 # Server threads handling requests concurrently
+MAX_PENDING_REQUESTS = 64 # Requests queued or running before the server stops reading its socket
+SHUTDOWN_POLL_INTERVAL = 1 # Seconds between checks of the server's running flag
+WORKER_RESTART_DELAY = 1 # Seconds waited after starting again the server processes which exited, before checking them again
+REQUEST_CACHE_CAPACITY = 4096 # Requests whose response is kept to answer retransmissions
+REQUEST_CACHE_TTL = 60 # Seconds a request's response is kept to answer retransmissions
+
+DB_BUSY_TIMEOUT = 10 # Seconds a connection waits for another process' write lock on the database
+DB_CACHE_SIZE = 8192 # Page cache of each database connection in KiB
+DB_MMAP_SIZE = 64 * 1024 * 1024 # Bytes of the database file memory-mapped by each connection
+
+SEARCH_MODES = ['EXACT', 'PREFIX', 'GLOB', 'FULLTEXT']
+SEARCH_RESULT_LIMIT = 100 # Maximum number of files returned by a SEARCH-FILE page
+RETRIEVE_PAGE_SIZE = 50 # Maximum number of clients returned by a RETRIEVE-ALL page
+
+BATCH_METHODS = ['REGISTER', 'DE-REGISTER', 'PUBLISH', 'REMOVE', 'RETRIEVE-INFO', 'SEARCH-FILE', 'UPDATE-CONTACT']
+MAX_BATCH_SIZE = 32 # Maximum number of requests in a BATCH request
+SERVER_METHODS = BATCH_METHODS + ['RETRIEVE-ALL', 'BATCH'] # Methods of the requests handled by the server, any other request is invalid
+
+CLIENT_CACHE_TTL = 0 # Seconds a client keeps the responses to its lookups, 0 to not cache them
+CLIENT_CACHE_CAPACITY = 256 # Lookups whose responses are kept by a client
+CACHED_STATUSES = ['RETRIEVED-ALL', 'RETRIEVED-INFO', 'FILE-FOUND'] # Responses kept by the client cache
+UDP_MAX_IN_FLIGHT = 32 # Requests a client waits for the response of at the same time, the next ones wait for one of them
+UDP_INITIAL_RTO = 1 # Seconds a client waits for a response before sending the request again, until round trips are measured
+UDP_MIN_RTO = 0.1 # Bounds of the retransmission timeout computed from the round trips measured
+UDP_MAX_RTO = 10
+UDP_RTO_JITTER = 0.1 # Fraction of each retransmission timeout added or removed at random, so clients do not retry together
+UDP_MAX_RETRIES = 3 # Times a request is sent again before giving up
+UDP_REQUEST_DEADLINE = 20 # Seconds after which a request without response is given up, whatever the retries left
+
+PUBLIC_FOLDER = os.path.join('..', 'public') # Folder of the files shared with other clients
+TRANSFER_MODES = ['CHUNK', 'STREAM'] # JSON chunks of text or raw bytes streamed after a single header
+STREAM_BUFFER_SIZE = 1024 * 1024 # Bytes received at once by a streamed download
+UPLOAD_BACKLOG = 128 # Connections from other clients waiting to be accepted
+MAX_UPLOADS = 32 # Downloads sent to other clients at the same time
+UPLOAD_QUEUE_SIZE = 256 # Download requests waiting for a download to complete before being refused
+UPLOAD_QUANTUM = 512 * 1024 # Bytes a connection may send in each round over the downloads being sent
+UPLOAD_RATE = 0 # Bytes per second sent to all other clients together, 0 for no limit
+UPLOAD_CONNECTION_RATE = 0 # Bytes per second sent on each connection, 0 for no limit
+RATE_BURST_TIME = 0.25 # Seconds of the rate limit that can be sent at once after being idle
+RATE_MIN_SEND = 16 * 1024 # Bytes a rate limited connection waits for before sending again
+COMPRESSION_CODECS = ['zlib', 'gzip', 'lzma', 'none'] # Compression of streamed downloads, in order of preference
+COMPRESSION_LEVEL = 6 # Level of the streams compressed by uploads, 0 to send files uncompressed
+COMPRESSION_BLOCK_SIZE = 64 * 1024 # Bytes of a file compressed at once by an upload
+COMPRESSIBLE_RATIO = 0.9 # Ranges whose first block does not compress below this ratio are sent uncompressed
+COMPRESSED_EXTENSIONS = ('.gz', '.tgz', '.bz2', '.xz', '.lzma', '.zst', '.zip', '.7z', '.rar', '.jpg', '.jpeg', '.png', '.gif',
+    '.webp', '.mp3', '.mp4', '.mkv', '.avi', '.mov', '.ogg', '.flac', '.pdf', '.docx', '.xlsx', '.pptx') # Files sent uncompressed
+PARTIAL_FILE_SUFFIX = '.part' # Suffix of a file being downloaded
+PROGRESS_FILE_SUFFIX = '.part.json' # Suffix of the progress of a file being downloaded
+CHUNK_FILE_SUFFIX = '.chunks.part' # Suffix of a file being downloaded in CHUNK mode, renamed once all its chunks are written
+CHUNK_REORDER_WINDOW = 1024 # Chunks received ahead of the next chunk to write kept in memory before the download fails
+PROGRESS_SAVE_INTERVAL = 16 * 1024 * 1024 # Bytes received between saves of a download's progress
+PROGRESS_SAVE_PERIOD = 1 # Seconds between saves of a download's progress, however few bytes are received
+HASH_CHUNK_SIZE = 8 * 1024 * 1024 # Bytes of a file hashed together, a chunk failing verification is downloaded again
+HASH_INDEX_FILE = os.path.join('..', 'public-index.json') # Hashes of the files in the public folder
+HASH_INDEX_INTERVAL = 30 # Seconds between checks of the public folder for files to hash
+MAX_VERIFY_ATTEMPTS = 3 # Downloads of a chunk failing verification before the download fails
+SWARM_RANGE_SIZE = HASH_CHUNK_SIZE # Bytes of a file downloaded at once from one of the peers holding it, verified on their own
+SWARM_MAX_PEERS = 8 # Peers a file is downloaded from at the same time
+SWARM_MAX_PEER_FAILURES = 3 # Failed ranges after which a peer is not used anymore
+SWARM_TIMEOUT = 10 # Seconds without data after which a range download fails
+SWARM_ENDGAME_COPIES = 2 # Peers downloading the same range at the same time, once every range is started
+GUI_POLL_INTERVAL = 50 # Milliseconds between updates of the GUI with the logs and results of the requests running
+
 FORMAT = 'utf-8'
 
 METHOD_HEADER_SIZE = 25
 LENGTH_HEADER_SIZE = 10
 TYPE_HEADER_SIZE = 9
 ENCODING_HEADER_SIZE = 6
+TEXT_CONTENT_TYPE = 'text/json' # Fixed length text header followed by indented JSON
+BINARY_CONTENT_TYPE = 'bin/json' # Binary header followed by compact JSON
+
 HEADER_SIZE = METHOD_HEADER_SIZE + LENGTH_HEADER_SIZE + TYPE_HEADER_SIZE + ENCODING_HEADER_SIZE + 58 # HEADER_SIZE = 108
\ No newline at end of file
@@ -1,4 +1,5 @@
 class FileDto:
-    def __init__(self, client_name: str, files: list) -> None:
+    def __init__(self, client_name: str, files: list, hashes: dict = None) -> None:
         self.client_name = client_name
         self.files = files
+        self.hashes = hashes or {} # file name -> hash advertised by the client
@@ -0,0 +1,122 @@
+import socket, threading
+from collections import deque
+from typing import Optional, Tuple
+
+from models.constants import SWARM_ENDGAME_COPIES
+
+
+class RangeScheduler():
+    """
+    Hands out the ranges of a file downloaded from several peers. Each peer takes the next range not started yet.
+    Once every range is started, an idle peer takes a range still being downloaded by another peer (endgame), so a slow
+    peer does not hold up the end of the download: the first copy completed is kept and the other downloads of the
+    range are cut off. At most `copies` peers download the same range at the same time.
+    The ranges before `start` are already downloaded.
+    """
+
+    def __init__(self, size: int, range_size: int, copies: int = SWARM_ENDGAME_COPIES, start: int = 0):
+        self.lock = threading.Lock()
+        self.size = size
+        self.range_size = range_size
+        self.start = start
+        self.copies = copies
+        self.pending = deque((offset, min(range_size, size - offset)) for offset in range(start, size, range_size))
+        self.active = {} # offset -> [length, {peer: socket or None}] of the ranges being downloaded
+        self.done = set() # Offsets of the ranges completed
+        self.error = None # Error stopping the download, no range is handed out anymore
+
+    def remaining(self) -> int:
+        with self.lock:
+            return len(self.pending) + len(self.active)
+
+    def is_complete(self) -> bool:
+        return self.remaining() == 0
+
+    def next(self, peer: tuple) -> Optional[Tuple[int, int]]:
+        """Returns the offset and length of the next range for the peer to download, None if there is none."""
+        with self.lock:
+            if (self.error is not None):
+                return None
+            if (self.pending):
+                offset, length = self.pending.popleft()
+                self.active[offset] = [length, {peer: None}]
+                return offset, length
+
+            candidates = [(len(peers), offset) for offset, (length, peers) in self.active.items()
+                          if peer not in peers and len(peers) < self.copies]
+            if (not candidates):
+                return None
+            offset = min(candidates)[1] # Range downloaded by the fewest peers, then the first one
+            length, peers = self.active[offset]
+            peers[peer] = None
+            return offset, length
+
+    def connected(self, peer: tuple, offset: int, sock: socket.socket) -> None:
+        """Keep the socket downloading the range, to cut it off if another peer completes the range first."""
+        with self.lock:
+            if (offset in self.active and peer in self.active[offset][1]):
+                self.active[offset][1][peer] = sock
+                return
+        self.__cut_off(sock)
+
+    def complete(self, peer: tuple, offset: int) -> bool:
+        """
+        Returns True if the peer completed the range first, it must then write it to the file.
+        The other downloads of the range are cut off.
+        """
+        with self.lock:
+            if (offset not in self.active or offset in self.done or peer not in self.active[offset][1]):
+                return False
+            length, peers = self.active.pop(offset)
+            self.done.add(offset)
+        for other_peer, sock in peers.items():
+            if (other_peer != peer and sock is not None):
+                self.__cut_off(sock)
+        return True
+
+    def fail(self, peer: tuple, offset: int) -> bool:
+        """
+        The peer failed to download the range, it is downloaded again unless another peer is still downloading it.
+        Returns False if the download was cut off because another peer completed the range or the download stopped,
+        it is not a failure of the peer.
+        """
+        with self.lock:
+            if (self.error is not None):
+                return False # Cut off because the download stopped
+            if (offset not in self.active or peer not in self.active[offset][1]):
+                return offset not in self.done
+            length, peers = self.active[offset]
+            del peers[peer]
+            if (not peers):
+                del self.active[offset]
+                self.pending.append((offset, length))
+            return True
+
+    def completed(self) -> int:
+        """Returns the bytes from the start of the file completed without gap, a download stopped resumes after them."""
+        with self.lock:
+            offset = self.start
+            while (offset in self.done):
+                offset += self.range_size
+            return min(offset, self.size)
+
+    def abort(self, err: Exception) -> None:
+        """Stop the download because of an error, the ranges being downloaded are cut off."""
+        with self.lock:
+            if (self.error is None):
+                self.error = err
+            sockets = [sock for length, peers in self.active.values() for sock in peers.values() if sock is not None]
+        for sock in sockets:
+            self.__cut_off(sock)
+
+    def put_back(self, offset: int, length: int) -> None:
+        """Download a range completed again, if it could not be written."""
+        with self.lock:
+            self.done.discard(offset)
+            self.pending.append((offset, length))
+
+    def __cut_off(self, sock: socket.socket) -> None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass # Already closed
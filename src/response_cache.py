@@ -0,0 +1,62 @@
+import threading, time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from models.constants import CLIENT_CACHE_CAPACITY, CLIENT_CACHE_TTL
+
+
+class ResponseCache():
+    """
+    Bounded cache of the responses to a client's lookups (`SEARCH-FILE`, `RETRIEVE-INFO` and `RETRIEVE-ALL`), keyed by
+    the request. Entries older than `ttl` seconds expire and the least recently used entry is evicted past `capacity` entries.
+    The cache is cleared when the client changes the registry, a response to a lookup sent before is not kept then.
+    """
+
+    def __init__(self, ttl: float = CLIENT_CACHE_TTL, capacity: int = CLIENT_CACHE_CAPACITY):
+        self.ttl = ttl
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.entries = OrderedDict() # request key -> [saved at, response]
+        self.generation = 0 # Incremented each time the cache is cleared
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[object]:
+        """Returns the response saved for a request, None if there is none or it expired."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if (entry is not None and now - entry[0] >= self.ttl):
+                del self.entries[key]
+                self.evictions += 1
+                entry = None
+            if (entry is None):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, response, generation: int) -> None:
+        """Save the response to a request sent at `generation`, unless the cache was cleared since."""
+        with self.lock:
+            if (generation != self.generation):
+                return
+            self.entries[key] = [time.monotonic(), response]
+            self.entries.move_to_end(key)
+            if (len(self.entries) > self.capacity):
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
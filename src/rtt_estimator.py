@@ -0,0 +1,53 @@
+import random, threading
+
+from models.constants import UDP_INITIAL_RTO, UDP_MIN_RTO, UDP_MAX_RTO, UDP_RTO_JITTER
+
+
+class RttEstimator():
+    """
+    Estimates the retransmission timeout (RTO) of requests to a server from the round trip times measured (Jacobson's algorithm,
+    RFC 6298): a smoothed round trip time (SRTT) and its variation (RTTVAR) are updated with each sample, RTO = SRTT + 4 * RTTVAR.
+    Following Karn's algorithm, round trips of requests sent again are not measured since their response may answer any of the
+    copies, and the RTO is doubled after a timeout until a round trip is measured again.
+    """
+
+    ALPHA = 1 / 8 # Weight of a new sample in SRTT
+    BETA = 1 / 4 # Weight of a new sample in RTTVAR
+
+    def __init__(self, initial_rto: float = UDP_INITIAL_RTO, min_rto: float = UDP_MIN_RTO, max_rto: float = UDP_MAX_RTO):
+        self.lock = threading.Lock()
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.srtt = None
+        self.rttvar = None
+        self.rto = initial_rto
+
+    def sample(self, rtt: float) -> None:
+        """Update the estimate with the round trip of a request answered without being sent again."""
+        with self.lock:
+            if (self.srtt is None):
+                self.srtt = rtt
+                self.rttvar = rtt / 2
+            else:
+                self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+                self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+            self.rto = min(max(self.srtt + 4 * self.rttvar, self.min_rto), self.max_rto)
+
+    def timeout(self, rto: float, attempt: int) -> float:
+        """
+        Seconds to wait for a response to the `attempt`th copy of a request sent when the RTO was `rto`,
+        doubled for each copy sent before and with jitter.
+        """
+        return min(rto * 2 ** attempt, self.max_rto) * random.uniform(1 - UDP_RTO_JITTER, 1 + UDP_RTO_JITTER)
+
+    def backoff(self, rto: float) -> None:
+        """
+        Keep the doubled RTO after a request sent when the RTO was `rto` timed out, for the next requests. Requests timing out
+        together double it once, and the next copies of a request are backed off on their own, see `timeout`.
+        """
+        with self.lock:
+            self.rto = max(self.rto, min(rto * 2, self.max_rto))
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'srtt': self.srtt, 'rttvar': self.rttvar, 'rto': self.rto}
@@ -1,33 +1,60 @@
-import socket, threading, sys, time
+import socket, threading, sys, time, argparse, signal, multiprocessing, multiprocessing.connection, re
 from datetime import datetime
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 from message import message as msg_lib
-from models.constants import BUFFER_SIZE, FORMAT
+from models.constants import BUFFER_SIZE, TEXT_CONTENT_TYPE, MAX_WORKERS, MAX_PENDING_REQUESTS, SHUTDOWN_POLL_INTERVAL, SEARCH_RESULT_LIMIT, RETRIEVE_PAGE_SIZE, BATCH_METHODS, MAX_BATCH_SIZE, \
+    SERVER_METHODS, WORKER_RESTART_DELAY
 from data.client_store import ClientStore
-from data.store import StoreException
+from data.request_store import RequestStore
+from data.request_cache import RequestCache, SharedRequestCache
+from data.registry_cache import RegistryCache
+from data.store import StoreException, connection_pool
 from models.client_dto import ClientDto
 from models.file_dto import FileDto
 
+RQ_NUM_PATTERN = re.compile(rb'"RQ#":\s*(\d+)') # RQ# of a request too large to be parsed
+
 class Server:
 
-    def __init__(self, host, port):
+    def __init__(self, host, port, max_workers: int = MAX_WORKERS, max_pending: int = MAX_PENDING_REQUESTS,
+                 reuse_port: bool = False, shared_rq_nums: bool = False, registry_cache: bool = True, create_db: bool = True):
         """
-        Initializes the server by creating a UDP socket and a new database if the
-        database does not exist.
+        Initializes the server by creating a UDP socket, the worker pool handling requests
+        and a new database if the database does not exist, unless `create_db` is False because
+        it was already created or upgraded by the supervisor of several processes. At most `max_pending` requests
+        are queued or running at once, after which the server stops reading its socket.
+        With `reuse_port` several server processes can bind the same port, and with
+        `shared_rq_nums` received RQ# and their responses are saved in the database instead of in memory.
+        With `registry_cache` the database is loaded in memory to answer read requests,
+        it must be disabled if another process writes to the database.
         """
 
         self.host = host
         self.port = port
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)  # UDP Socket
-        self.clients_rq_num_dict = defaultdict(list)
-
-        with ClientStore() as db:
-            try:
-                db.create_tables()
-                db.complete()
-            except:
-                pass # DB already created, do nothing
+        if (reuse_port):
+            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.request_cache = SharedRequestCache() if shared_rq_nums else RequestCache()
+        self.request_context = threading.local() # Content type of the request being handled by each thread
+        self.running = threading.Event()
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='request')
+        self.pending_requests = threading.BoundedSemaphore(max_pending)
+
+        if (create_db):
+            create_database()
+            if (shared_rq_nums):
+                with RequestStore() as db:
+                    db.create_tables()
+                    db.complete()
+
+        self.registry = None
+        if (registry_cache):
+            self.registry = RegistryCache()
+            with ClientStore() as db:
+                clients, files = db.retrieve_registry()
+                self.registry.load(clients, files)
 
     def print_log(self, msg: str):
         """
@@ -39,68 +66,176 @@ class Server:
     def start_server(self):
         """
         Infinite loop to listen for incoming requests from clients.
-        Each request is handled on a new thread.
+        Each request is submitted to the worker pool. When the pool is full the loop
+        blocks before reading the next datagram, leaving excess requests in the socket buffer.
         """
 
         self.print_log('Starting Server...')
         self.server_socket.bind((self.host, self.port))
+        self.server_socket.settimeout(SHUTDOWN_POLL_INTERVAL) # Wake up regularly to check if server is stopping
+        self.running.set()
         self.print_log('Server is listening on {}:{}'.format(self.host, self.port))
 
-        while (True):
+        while (self.running.is_set()):
+            self.pending_requests.acquire()
             try:
-                request, client_addr = self.server_socket.recvfrom(BUFFER_SIZE)
-                new_request_thread = threading.Thread(target=self.handle_request, args=(request, client_addr))
-                new_request_thread.start()
-                new_request_thread.join()
+                request, client_addr = self.server_socket.recvfrom(BUFFER_SIZE + 1) # A longer request is truncated and rejected
+                future = self.executor.submit(self.handle_request, request, client_addr)
+                future.add_done_callback(self.request_done)
 
-            except OSError as err:
-                self.print_log('ERROR: {}'.format(err))
+            except socket.timeout:
+                self.pending_requests.release()
+
+            except (OSError, RuntimeError) as err: # RuntimeError if worker pool is shut down
+                self.pending_requests.release()
+                if (self.running.is_set()):
+                    self.print_log('ERROR: {}'.format(err))
+
+    def request_done(self, future):
+        """
+        Free a slot in the worker pool and log any error raised while handling the request.
+        """
+        self.pending_requests.release()
+        err = future.exception()
+        if (err is not None):
+            self.print_log('ERROR: {}'.format(err))
 
     def stop_server(self):
         """
-        Close server's UDP socket.
+        Stop reading new requests, wait for requests already being handled to be
+        responded to and close server's UDP socket.
         """
         self.print_log('Server is shutting down...')
+        self.running.clear()
+        self.executor.shutdown(wait=True)
         self.server_socket.close()
+        self.print_log('Request cache {}'.format(self.request_cache.stats()))
 
     def handle_request(self, request: bytes, client_addr):
         """
-        Read client's request and call corresponding function to that method. If method is not found response with an invalid request. 
-        If response is empty just ignore request and do not send a response. All duplicate requests (RQ#) are ignored.
+        Process client's request and send the response back on the server's UDP socket.
+        If response is empty just ignore request and do not send a response.
+        """
+
+        rq_num, response = self.process_request(request, client_addr)
+
+        try:
+            self.server_socket.sendto(response, client_addr)
+            self.print_log('Responding to request RQ# {} from {}'.format(rq_num, client_addr[0]))
+
+        except TypeError:
+            self.print_log('Ignoring request RQ# {} from {}'.format(rq_num, client_addr[0]))
+            pass
+
+    def process_request(self, request: bytes, client_addr):
+        """
+        Read client's request and call corresponding function to that method. If method is not a request of `SERVER_METHODS` response with an invalid request. 
+        Duplicate requests (RQ#) get the response already sent for them, or an empty response if the request is still being handled.
+        Returns the request's RQ# and the encoded response.
         """
 
-        request = request.decode(FORMAT)
         self.print_log('New request from {}:{}'.format(client_addr[0], client_addr[1]))
-        self.print_log('Client Request\n{}\n'.format(request))
+        if (len(request) > BUFFER_SIZE):
+            return self.request_too_large(request, client_addr)
 
-        headers = msg_lib.extract_headers(request)
-        body = msg_lib.extract_body(request)
+        message = msg_lib.parse(request)
+        method_call = message.method
+        body = message.body
+        self.print_log('Client Request\n{}\n{}\n'.format(message.headers, body))
 
-        try:
-            # Check for duplicate requests and ignore
-            if (body['RQ#'] in self.clients_rq_num_dict[f'{client_addr[0]}:{client_addr[1]}']):
-                self.print_log('Request RQ# {} already received from {}, ignoring request...'.format(body['RQ#'], client_addr[0]))
-                return
+        self.request_context.content_type = message.headers['content-type'] # Respond in the same content type
 
-            # Save in memory all clients RQ#
-            self.clients_rq_num_dict[f'{client_addr[0]}:{client_addr[1]}'].append(body['RQ#'])
+        addr = f'{client_addr[0]}:{client_addr[1]}'
+        is_duplicate, response = self.request_cache.begin(addr, body['RQ#'])
+        if (is_duplicate):
+            if (response is None):
+                self.print_log('Request RQ# {} already received from {}, ignoring request...'.format(body['RQ#'], client_addr[0]))
+            else:
+                self.print_log('Request RQ# {} already received from {}, sending response again...'.format(body['RQ#'], client_addr[0]))
+            return body['RQ#'], response
 
-            method_call = msg_lib.extract_method(request)
-            response = getattr(self, method_call)(body, client_addr) # Call function based on method in request header
+        try:
+            if (method_call.upper().replace('_', '-') in SERVER_METHODS): # Other methods of the server cannot be requested
+                response = getattr(self, method_call)(body, client_addr) # Call function based on method in request header
+            else:
+                response = self.invalid_request()
         
         except AttributeError:
             response = self.invalid_request() # Invalid request if method is not found 
 
-        try:
-            self.server_socket.sendto(response, client_addr)
-            self.print_log('Responding to request RQ# {} from {}'.format(body['RQ#'], client_addr[0]))
+        except Exception:
+            self.request_cache.discard(addr, body['RQ#']) # Handle retransmission again
+            raise
 
-        except TypeError:
-            self.print_log('Ignoring request RQ# {} from {}'.format(body['RQ#'], client_addr[0]))
-            pass
+        self.request_cache.save_response(addr, body['RQ#'], response)
+        return body['RQ#'], response
+
+    def request_too_large(self, request: bytes, client_addr):
+        """
+        Respond with an error to a request larger than a datagram, which was truncated. Its RQ# is read
+        from the start of the body when possible, so the client gets the error instead of sending the request again.
+        """
+        match = RQ_NUM_PATTERN.search(request)
+        rq_num = int(match.group(1)) if match else None
+        self.print_log('[ERROR] Request RQ# {} from {} is larger than {} bytes'.format(rq_num, client_addr[0], BUFFER_SIZE))
+        return rq_num, msg_lib.create_response({
+            'RQ#': rq_num,
+            'STATUS': 'ERROR',
+            'REASON': 'Request larger than {} bytes'.format(BUFFER_SIZE)
+        }, 400)
+
+    def read_store(self, cached: bool = True):
+        """
+        Returns the registry cache to answer a read request from memory if it is enabled,
+        otherwise a new client store reading the database. Reads within a batch use the database,
+        to see the changes of the batch not committed yet.
+        """
+        if (cached and self.registry is not None and not connection_pool.open_stores()):
+            return self.registry
+        return ClientStore()
+
+    def check_registry(self) -> bool:
+        """
+        Compare the registry cache with the database and log every difference found.
+        Returns True if the cache is disabled or consistent.
+        """
+        if (self.registry is None):
+            return True
+
+        with self.registry.lock: # No write can be committed while comparing
+            with ClientStore() as db:
+                clients, files = db.retrieve_registry()
+            differences = self.registry.check_consistency(clients, files)
+
+        for difference in differences:
+            self.print_log('[ERROR] Registry cache inconsistent, {}'.format(difference))
+        return not differences
+
+    def create_response(self, payload, status_code: int):
+        """
+        Encode the response in the content type of the request being handled on this thread.
+        Responses to the requests of a batch are not encoded, their payload is added to the batch response.
+        """
+        if (getattr(self.request_context, 'in_batch', False)):
+            return payload
+        return self.encode_response(payload, status_code)
+
+    def encode_response(self, payload, status_code: int = 200) -> bytes:
+        content_type = getattr(self.request_context, 'content_type', TEXT_CONTENT_TYPE)
+        return msg_lib.create_response(payload, status_code, content_type)
+
+    def response_size(self, payload: dict) -> int:
+        """
+        Returns the size of the datagram sending the response. For the requests of a batch, the size of the batch response
+        with the response added after those of the requests before it.
+        """
+        batch_response = getattr(self.request_context, 'batch_response', None)
+        if (batch_response is None):
+            return len(self.encode_response(payload))
+        return len(self.encode_response(dict(batch_response, RESPONSES=batch_response['RESPONSES'] + [payload])))
 
     def invalid_request(self):
-        return msg_lib.create_response({
+        return self.create_response({
             'STATUS': 'ERROR',
             'REASON': 'Invalid request'
         }, 500) 
@@ -108,19 +243,19 @@ class Server:
     def register(self, data: dict, client_addr):
         client_dto = ClientDto(data['NAME'], data['IP_ADDRESS'], client_addr[1], data['TCP_SOCKET'])
         
-        with ClientStore() as db:
+        with ClientStore(self.registry) as db:
             try:
                 self.print_log('Adding client to database')
                 db.register_client(client_dto)
                 db.complete()
-                return msg_lib.create_response({
+                return self.create_response({
                     'RQ#': data['RQ#'],
                     'STATUS': 'REGISTERED'
                 }, 200)
 
             except StoreException as err:
                 self.print_log('[ERROR] {}'.format(err))
-                return msg_lib.create_response({
+                return self.create_response({
                     'RQ#': data['RQ#'],
                     'STATUS': 'REGISTER-DENIED',
                     'REASON': '{}'.format(err)
@@ -129,40 +264,40 @@ class Server:
     def de_register(self, data: dict, client_addr):
         client_name = data['NAME']
         
-        with ClientStore() as db:
+        with ClientStore(self.registry) as db:
             try:
                 self.print_log('Removing client from database')
                 db.deregister_client(client_name)
                 db.complete()
-                return msg_lib.create_response({
+                return self.create_response({
                     'RQ#': data['RQ#'],
                     'STATUS': 'DE-REGISTERED'
                 }, 200)
 
             except StoreException as err:
                 self.print_log('[ERROR] {}'.format(err))
-                return msg_lib.create_response({
+                return self.create_response({
                     'RQ#': data['RQ#'],
                     'STATUS': 'DE-REGISTER-ERROR',
                     'REASON': '{}'.format(err)
                 }, 500)
     
     def publish(self, data: dict, client_addr):
-        file_dto = FileDto(data['NAME'], data['LIST_OF_FILES']) 
+        file_dto = FileDto(data['NAME'], data['LIST_OF_FILES'], data.get('HASHES'))
         
-        with ClientStore() as db:
+        with ClientStore(self.registry) as db:
             try:
                 self.print_log('Publishing list of files to database')
                 db.publish_files(file_dto)
                 db.complete()
-                return msg_lib.create_response({
+                return self.create_response({
                     'RQ#': data['RQ#'],
                     'STATUS': 'PUBLISHED'
                 }, 200)
 
             except StoreException as err:
                 self.print_log('[ERROR] {}'.format(err))
-                return msg_lib.create_response({
+                return self.create_response({
                     'RQ#': data['RQ#'],
                     'STATUS': 'PUBLISH-DENIED',
                     'REASON': '{}'.format(err)
@@ -171,41 +306,94 @@ class Server:
     def remove(self, data: dict, client_addr):
         file_dto = FileDto(data['NAME'], data['LIST_OF_FILES'])
         
-        with ClientStore() as db:
+        with ClientStore(self.registry) as db:
             try:
                 self.print_log('Removing list of files from database')
                 db.remove_files(file_dto)
                 db.complete()
-                return msg_lib.create_response({
+                return self.create_response({
                     'RQ#': data['RQ#'],
                     'STATUS': 'REMOVED'
                 }, 200)
 
             except StoreException as err:
                 self.print_log('[ERROR] {}'.format(err))
-                return msg_lib.create_response({
+                return self.create_response({
                     'RQ#': data['RQ#'],
                     'STATUS': 'REMOVED-DENIED',
                     'REASON': '{}'.format(err)
                 }, 500)
 
+    def create_page_response(self, payload: dict, key: str, items: list, page_size: int, next_cursor, split_key: str = None,
+                             split_cursor=None):
+        """
+        Encode a page of `items` under `key` of the payload. `items` holds one item more than the page
+        if there is a next page, in which case `NEXT_CURSOR` is set to `next_cursor(page)`. The page is
+        halved until the response fits in a single datagram, in a batch until the batch response does,
+        where the page can be left empty for the client to request it on its own.
+        If a single item does not fit, its list under `split_key` is split across pages: the item is sent with the
+        `count` first elements of its list and `NEXT_CURSOR` is set to `split_cursor(count)`.
+        A response which does not fit even then is replaced with an error.
+        """
+        has_next_page = len(items) > page_size
+        page = items[:page_size]
+        min_page_size = 0 if getattr(self.request_context, 'in_batch', False) else 1
+
+        while (True):
+            payload[key] = page
+            payload['NEXT_CURSOR'] = next_cursor(page) if has_next_page else None
+            if (self.response_size(payload) <= BUFFER_SIZE):
+                return self.create_response(payload, 200)
+            if (len(page) <= min_page_size):
+                break
+
+            page = page[:len(page) // 2]
+            has_next_page = True
+
+        if (split_key is not None and page):
+            item = page[0]
+            count = len(item[split_key])
+            while (count > 1):
+                count //= 2
+                payload[key] = [dict(item, **{split_key: item[split_key][:count]})]
+                payload['NEXT_CURSOR'] = split_cursor(count)
+                if (self.response_size(payload) <= BUFFER_SIZE):
+                    return self.create_response(payload, 200)
+
+        self.print_log('[ERROR] Response RQ# {} is larger than {} bytes'.format(payload.get('RQ#'), BUFFER_SIZE))
+        return self.create_response({
+            'RQ#': payload.get('RQ#'),
+            'STATUS': 'ERROR',
+            'REASON': 'Response larger than {} bytes'.format(BUFFER_SIZE)
+        }, 500)
+
     def retrieve_all(self, data: dict, client_addr):
         client_name = data['NAME']
+        page_size = max(min(int(data.get('PAGE_SIZE', RETRIEVE_PAGE_SIZE)), RETRIEVE_PAGE_SIZE), 1)
+        cursor = data.get('CURSOR')
+        file_offset = 0
+        if (isinstance(cursor, list)): # Continues the files of a client too large for the previous page
+            cursor, file_offset = str(cursor[0]), int(cursor[1])
 
-        with ClientStore() as db:
+        with self.read_store() as db:
             try:
                 self.print_log('Retrieving list of all clients from database')
-                all_clients = db.retrieve_all(client_name)
+                clients = []
+                if (file_offset > 0):
+                    client = db.retrieve_info(client_name, cursor)
+                    clients.append({'NAME': client[0], 'IP_ADDRESS': client[1], 'TCP_SOCKET': client[2], 'LIST_OF_FILES': client[3][file_offset:]})
+                all_clients = db.retrieve_all(client_name, cursor, page_size + 1 - len(clients))
+                clients += [{'NAME': col[0], 'IP_ADDRESS': col[1], 'TCP_SOCKET': col[2], 'LIST_OF_FILES': col[3]} for col in all_clients] # Built while rows are read
                 db.complete()
-                return msg_lib.create_response({
+                return self.create_page_response({
                     'RQ#': data['RQ#'],
-                    'STATUS': 'RETRIEVED-ALL',
-                    'CLIENTS': [{'NAME': col[0], 'IP_ADDRESS': col[1], 'TCP_SOCKET': col[2], 'LIST_OF_FILES': col[3]} for col in all_clients]
-                }, 200)
+                    'STATUS': 'RETRIEVED-ALL'
+                }, 'CLIENTS', clients, page_size, lambda page: page[-1]['NAME'], # Next page starts after last client
+                'LIST_OF_FILES', lambda count: [clients[0]['NAME'], file_offset + count]) # or within the files of the first one
 
             except StoreException as err:
                 self.print_log('[ERROR] {}'.format(err))
-                return msg_lib.create_response({
+                return self.create_response({
                     'RQ#': data['RQ#'],
                     'STATUS': 'RETRIEVE-ERROR',
                     'REASON': '{}'.format(err)
@@ -214,24 +402,25 @@ class Server:
     def retrieve_info(self, data: dict, client_addr):
         client_name = data['NAME']
         search_name = data['SEARCH_NAME']
+        offset = int(data.get('CURSOR') or 0)
         
-        with ClientStore() as db:
+        with self.read_store() as db:
             try:
                 self.print_log('Retrieving info of client {} from database'.format(search_name))
                 client = db.retrieve_info(client_name, search_name)
                 db.complete()
-                return msg_lib.create_response({
+                files = client[3][offset:]
+                return self.create_page_response({
                     'RQ#': data['RQ#'],
                     'STATUS': 'RETRIEVED-INFO',
                     'NAME': client[0],
                     'IP_ADDRESS': client[1],
-                    'TCP_SOCKET': client[2],
-                    'LIST_OF_FILES': client[3]
-                }, 200)
+                    'TCP_SOCKET': client[2]
+                }, 'LIST_OF_FILES', files, len(files), lambda page: offset + len(page)) # Next page starts after files already sent
 
             except StoreException as err:
                 self.print_log('[ERROR] {}'.format(err))
-                return msg_lib.create_response({
+                return self.create_response({
                     'RQ#': data['RQ#'],
                     'STATUS': 'RETRIEVE-ERROR',
                     'REASON': '{}'.format(err)
@@ -240,35 +429,91 @@ class Server:
     def search_file(self, data: dict, client_addr):
         client_name = data['NAME']
         file_name = data['FILE_NAME']
+        mode = data.get('MODE', 'EXACT')
+        page_size = max(min(int(data.get('PAGE_SIZE', SEARCH_RESULT_LIMIT)), SEARCH_RESULT_LIMIT), 1)
+        offset = int(data.get('CURSOR') or 0)
         
-        with ClientStore() as db:
+        with self.read_store(mode == 'EXACT') as db:
             try:
-                self.print_log('Searching for file {} in database'.format(file_name))
-                clients = db.search_file(client_name, file_name)
+                self.print_log('Searching for file {} in database ({} search)'.format(file_name, mode.lower()))
+                clients = db.search_file(client_name, file_name, mode, page_size + 1, offset)
                 db.complete()
-                return msg_lib.create_response({
+                return self.create_page_response({
                     'RQ#': data['RQ#'],
-                    'STATUS': 'FILE-FOUND',
-                    'CLIENTS': [{'NAME': col[0], 'IP_ADDRESS': col[1], 'TCP_SOCKET': col[2]} for col in clients]
-                }, 200)
+                    'STATUS': 'FILE-FOUND'
+                }, 'CLIENTS', [{'NAME': col[0], 'IP_ADDRESS': col[1], 'TCP_SOCKET': col[2], 'FILE_NAME': col[3], 'HASH': col[4]} for col in clients],
+                page_size, lambda page: offset + len(page)) # Next page starts after files already sent
 
             except StoreException as err:
                 self.print_log('[ERROR] {}'.format(err))
-                return msg_lib.create_response({
+                return self.create_response({
                     'RQ#': data['RQ#'],
                     'STATUS': 'SEARCH-ERROR',
                     'REASON': '{}'.format(err)
                 }, 500)
 
+    def batch(self, data: dict, client_addr):
+        """
+        Handle each request of `REQUESTS` in a single unit of work. A request that fails is rolled back
+        on its own and the others are committed together. Responds with the response of each request in order,
+        pages found are shrunk to fit in the datagram and the batch is rolled back and denied if its response still does not.
+        """
+        requests = data['REQUESTS']
+        if (not isinstance(requests, list)):
+            return self.invalid_request()
+        if (len(requests) > MAX_BATCH_SIZE):
+            return self.create_response({
+                'RQ#': data['RQ#'],
+                'STATUS': 'BATCH-DENIED',
+                'REASON': 'Batch cannot contain more than {} requests'.format(MAX_BATCH_SIZE)
+            }, 400)
+
+        self.print_log('Handling batch of {} requests'.format(len(requests)))
+        batch_response = {
+            'RQ#': data['RQ#'],
+            'STATUS': 'BATCH-DONE',
+            'RESPONSES': []
+        }
+        with ClientStore(self.registry) as db:
+            self.request_context.in_batch = True
+            self.request_context.batch_response = batch_response # Pages of the requests are shrunk to the space left
+            try:
+                for request in requests:
+                    method = request.get('METHOD', '') if isinstance(request, dict) else ''
+                    if (method not in BATCH_METHODS):
+                        batch_response['RESPONSES'].append({'STATUS': 'ERROR', 'REASON': 'Invalid request'})
+                        continue
+
+                    request = dict(request, **{'RQ#': data['RQ#']})
+                    try:
+                        batch_response['RESPONSES'].append(getattr(self, method.lower().replace('-', '_'))(request, client_addr)) # Each request is nested in the batch's unit of work
+                    except (KeyError, TypeError, ValueError): # Missing or invalid fields, rolled back on its own
+                        batch_response['RESPONSES'].append({'STATUS': 'ERROR', 'REASON': 'Invalid request'})
+            finally:
+                self.request_context.in_batch = False
+                self.request_context.batch_response = None
+
+            response = self.create_response(batch_response, 200)
+            if (len(response) > BUFFER_SIZE): # Not committed, the client is not told about changes it cannot read
+                self.print_log('[ERROR] Batch response is larger than {} bytes, rolling back batch'.format(BUFFER_SIZE))
+                return self.create_response({
+                    'RQ#': data['RQ#'],
+                    'STATUS': 'BATCH-DENIED',
+                    'REASON': 'Batch response larger than {} bytes, send fewer requests'.format(BUFFER_SIZE)
+                }, 400)
+            db.complete()
+
+        return response
+
     def update_contact(self, data: dict, client_addr):
         client_dto = ClientDto(data['NAME'], data['IP_ADDRESS'], client_addr[1], data['TCP_SOCKET'])
         
-        with ClientStore() as db:
+        with ClientStore(self.registry) as db:
             try:
                 self.print_log('Adding client to database')
                 db.update_client(client_dto)
                 db.complete()
-                return msg_lib.create_response({
+                return self.create_response({
                     'RQ#': data['RQ#'],
                     'STATUS': 'UPDATE-CONFIRMED',
                     'NAME': client_dto.name,
@@ -279,7 +524,7 @@ class Server:
 
             except StoreException as err:
                 self.print_log('[ERROR] {}'.format(err))
-                return msg_lib.create_response({
+                return self.create_response({
                     'RQ#': data['RQ#'],
                     'STATUS': 'UPDATE-DENIED',
                     'REASON': '{}'.format(err)
@@ -287,22 +532,107 @@ class Server:
 
 
 
-def main():
+def create_database():
+    """
+    Create the tables of the database if it does not exist, or upgrade the tables of an existing database,
+    and create their indexes. Run before the server processes sharing the database are started.
+    """
+    with ClientStore() as db:
+        try:
+            db.create_tables()
+            db.complete()
+        except:
+            pass # DB already created, do nothing
+
+    with ClientStore() as db:
+        db.upgrade_tables()
+        db.create_indexes()
+        db.complete()
+
+def create_server(engine: str, host, port, max_workers: int, **options):
+    if (engine == 'asyncio'):
+        from async_server import AsyncServer
+        return AsyncServer(host, port, max_workers, **options)
+    else:
+        return Server(host, port, max_workers, **options)
+
+def run_server(engine: str, host, port, max_workers: int, **options):
+    """
+    Run a server in the current process until SIGINT or SIGTERM is received, then stop it
+    once the requests already being handled are responded to. `options` are passed to the server.
+    """
+    server = create_server(engine, host, port, max_workers, **options)
+    stop_thread = threading.Thread(target=server.stop_server)
+
+    def handle_signal(signum, frame):
+        if (stop_thread.ident is None):
+            stop_thread.start() # Stop on another thread, the asyncio engine needs this thread to drain
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
     server.start_server()
+    stop_thread.join()
+
+def run_supervisor(engine: str, host, port, max_workers: int, num_processes: int):
+    """
+    Start `num_processes` server processes all bound to the same port with SO_REUSEPORT, the kernel
+    spreads requests between them. The database is created or upgraded once before they are started.
+    A process which exits is started again. On SIGINT or SIGTERM every process is stopped gracefully.
+    The registry cache is disabled since each process would only see its own writes.
+    """
+    create_database()
+    with RequestStore() as db: # Start with an empty request cache shared by all processes
+        db.drop_tables()
+        db.create_tables()
+        db.complete()
+
+    def start_process():
+        options = {'reuse_port': True, 'shared_rq_nums': True, 'registry_cache': False, 'create_db': False}
+        process = multiprocessing.Process(target=run_server, args=(engine, host, port, max_workers), kwargs=options)
+        process.start()
+        return process
+
+    stopping = threading.Event()
+
+    def handle_signal(signum, frame):
+        stopping.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    processes = [start_process() for _ in range(num_processes)]
+    while (not stopping.is_set()):
+        multiprocessing.connection.wait([process.sentinel for process in processes], timeout=SHUTDOWN_POLL_INTERVAL)
+        exited = [i for i, process in enumerate(processes) if (not process.is_alive())]
+        if (not exited or stopping.is_set()):
+            continue
+
+        for i in exited:
+            date_time = datetime.now().strftime(("%Y-%m-%d %H:%M:%S"))
+            print('[{}] [ERROR] Server process {} exited with code {}, starting it again'.format(date_time, processes[i].pid, processes[i].exitcode))
+            processes[i] = start_process()
+        time.sleep(WORKER_RESTART_DELAY) # A process failing on start is not started again right away
+
+    for process in processes:
+        if (process.is_alive()):
+            process.terminate()
+    for process in processes:
+        process.join()
 
 if __name__ == "__main__":
-    ip_address = socket.gethostbyname(socket.gethostname())
-    server = Server(ip_address, 9000)
+    parser = argparse.ArgumentParser(description='Station to Station index server')
+    parser.add_argument('--engine', choices=['threaded', 'asyncio'], default='threaded', help='request handling engine')
+    parser.add_argument('--threads', type=int, default=MAX_WORKERS, help='worker threads per server process')
+    parser.add_argument('--workers', type=int, default=1, help='server worker processes sharing port 9000 with SO_REUSEPORT')
+    parser.add_argument('--no-registry-cache', action='store_true', help='answer read requests from the database instead of memory')
+    args = parser.parse_args()
 
-    try:
-        thread = threading.Thread(target=main)
-        thread.daemon = True
-        thread.start()
-        while (True):
-            pass
-
-    except KeyboardInterrupt:
-        pass
-    finally:
-            server.stop_server()
-            sys.exit()
+    ip_address = socket.gethostbyname(socket.gethostname())
+    if (args.workers > 1):
+        if (not hasattr(socket, 'SO_REUSEPORT')):
+            parser.error('--workers requires SO_REUSEPORT which is not supported on this platform')
+        run_supervisor(args.engine, ip_address, 9000, args.threads, args.workers)
+    else:
+        run_server(args.engine, ip_address, 9000, args.threads, registry_cache=not args.no_registry_cache)
+    sys.exit()
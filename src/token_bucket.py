@@ -0,0 +1,55 @@
+import math, threading, time
+
+from models.constants import RATE_BURST_TIME, RATE_MIN_SEND
+
+
+class TokenBucket():
+    """
+    Limits the bytes sent to `rate` bytes per second. Tokens are added to the bucket at `rate` per second, up to
+    `RATE_BURST_TIME` seconds of them, and each byte sent takes one. A rate of 0 does not limit anything.
+    The rate can be changed at any time from another thread.
+    """
+
+    def __init__(self, rate: int = 0):
+        self.lock = threading.Lock()
+        self.rate = 0
+        self.capacity = 0
+        self.tokens = 0
+        self.updated = time.monotonic()
+        self.configure(rate)
+
+    def configure(self, rate: int) -> None:
+        with self.lock:
+            self.__refill()
+            previous = self.rate
+            self.rate = rate
+            self.capacity = max(rate * RATE_BURST_TIME, RATE_MIN_SEND) # Always enough tokens to send RATE_MIN_SEND bytes
+            self.tokens = self.capacity if (previous <= 0) else min(self.tokens, self.capacity)
+
+    def available(self) -> float:
+        """Returns the number of bytes that can be sent now."""
+        with self.lock:
+            if (self.rate <= 0):
+                return math.inf
+            self.__refill()
+            return self.tokens
+
+    def consume(self, size: int) -> None:
+        with self.lock:
+            if (self.rate > 0):
+                self.__refill()
+                self.tokens -= size
+
+    def delay(self, size: int) -> float:
+        """Returns the seconds until `size` bytes can be sent."""
+        with self.lock:
+            if (self.rate <= 0):
+                return 0
+            self.__refill()
+            return max(0, min(size, self.capacity) - self.tokens) / self.rate
+
+    def __refill(self) -> None:
+        now = time.monotonic()
+        if (self.rate > 0):
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
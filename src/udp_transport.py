@@ -0,0 +1,137 @@
+import socket, threading, time
+from concurrent.futures import Future, TimeoutError
+from typing import Optional
+
+from message import message as msg_lib
+from rtt_estimator import RttEstimator
+from models.constants import BUFFER_SIZE, SHUTDOWN_POLL_INTERVAL, UDP_MAX_IN_FLIGHT, UDP_MAX_RETRIES, UDP_REQUEST_DEADLINE
+
+
+class UdpTransport():
+    """
+    Sends the requests of a client to the server on its UDP socket and routes the responses to them.
+    A single receiver thread reads every response and completes the future of the request with the same RQ#,
+    so requests sent from several threads at once each get their own response. Responses to requests no longer
+    waited for are dropped. At most `max_in_flight` requests wait for a response at the same time.
+
+    A request is sent again after the retransmission timeout estimated from the round trips to its server, see `RttEstimator`,
+    at most `max_retries` times and until `deadline` seconds after it was first sent.
+    """
+
+    def __init__(self, sock: socket.socket, max_in_flight: int = UDP_MAX_IN_FLIGHT, max_retries: int = UDP_MAX_RETRIES,
+                 deadline: float = UDP_REQUEST_DEADLINE):
+        self.sock = sock
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.lock = threading.Lock()
+        self.window = threading.BoundedSemaphore(max_in_flight)
+        self.pending = {} # RQ# -> future of its response
+        self.estimators = {} # server address -> RttEstimator
+        self.metrics = {'requests': 0, 'responses': 0, 'retransmissions': 0, 'timeouts': 0, 'rtt_samples': 0}
+        self.running = threading.Event()
+        self.receiver_thread = None
+
+    def request(self, rq_num: int, request: bytes, server_addr: tuple, on_retry=None) -> Optional[dict]:
+        """
+        Send a request and wait for the body of its response, sending it again after each timeout.
+        Returns None if there is no response. Raises ConnectionError if the server is unavailable.
+        `on_retry` is called before the request is sent again.
+        """
+        with self.window:
+            future = Future()
+            estimator = self.get_estimator(server_addr)
+            with self.lock:
+                self.pending[rq_num] = future
+                self.metrics['requests'] += 1
+            try:
+                rto = estimator.rto
+                sent_at = time.monotonic()
+                deadline = sent_at + self.deadline
+                self.sock.sendto(request, server_addr)
+                self.start()
+
+                attempt = 0
+                while (True):
+                    try:
+                        body = future.result(max(0, min(estimator.timeout(rto, attempt), deadline - time.monotonic())))
+                    except TimeoutError:
+                        estimator.backoff(rto)
+                        if (attempt == self.max_retries or time.monotonic() >= deadline):
+                            self.count('timeouts')
+                            return None
+                        if (on_retry is not None):
+                            on_retry()
+                        attempt += 1
+                        self.count('retransmissions')
+                        self.sock.sendto(request, server_addr)
+                        continue
+
+                    self.count('responses')
+                    if (attempt == 0): # Karn's algorithm, the response to a request sent again may answer any copy
+                        estimator.sample(time.monotonic() - sent_at)
+                        self.count('rtt_samples')
+                    return body
+
+            finally:
+                with self.lock:
+                    self.pending.pop(rq_num, None)
+
+    def get_estimator(self, server_addr: tuple) -> RttEstimator:
+        with self.lock:
+            if (server_addr not in self.estimators):
+                self.estimators[server_addr] = RttEstimator()
+            return self.estimators[server_addr]
+
+    def count(self, metric: str) -> None:
+        with self.lock:
+            self.metrics[metric] += 1
+
+    def stats(self) -> dict:
+        """Returns the counts of requests, responses, retransmissions and requests without response, and the estimates of each server."""
+        with self.lock:
+            stats = dict(self.metrics)
+            estimators = dict(self.estimators)
+        stats['servers'] = {'{}:{}'.format(*addr): estimator.stats() for addr, estimator in estimators.items()}
+        return stats
+
+    def start(self) -> None:
+        """Start the receiver thread, once the socket is bound by the first request sent."""
+        with self.lock:
+            if (self.receiver_thread is not None):
+                return
+            self.running.set()
+            self.receiver_thread = threading.Thread(target=self.__receive_loop, daemon=True)
+            self.receiver_thread.start()
+
+    def stop(self) -> None:
+        self.running.clear()
+
+    def __receive_loop(self) -> None:
+        self.sock.settimeout(SHUTDOWN_POLL_INTERVAL)
+        while (self.running.is_set()):
+            try:
+                response, addr = self.sock.recvfrom(BUFFER_SIZE)
+                body = msg_lib.parse(response).body
+            except socket.timeout:
+                continue
+            except ConnectionError as err:
+                self.__fail_pending(err) # Server port unreachable, every request waiting fails
+                continue
+            except (ValueError, TypeError):
+                continue # Not a message
+            except OSError:
+                break # Socket closed
+
+            if (not isinstance(body, dict)):
+                continue
+            with self.lock:
+                future = self.pending.get(body.get('RQ#'))
+            if (future is not None and not future.done()):
+                future.set_result(body)
+
+    def __fail_pending(self, err: Exception) -> None:
+        with self.lock:
+            futures = list(self.pending.values())
+        for future in futures:
+            if (not future.done()):
+                future.set_exception(ConnectionError(*err.args))
@@ -0,0 +1,444 @@
+import os, selectors, socket, threading, time
+from collections import Counter, deque
+
+from message import message as msg_lib
+from frame_reader import FrameReader
+from token_bucket import TokenBucket
+from compression import choose_codec, create_compressor, is_compressible
+from models.constants import BUFFER_SIZE, PUBLIC_FOLDER, UPLOAD_BACKLOG, MAX_UPLOADS, UPLOAD_QUEUE_SIZE, UPLOAD_QUANTUM, \
+    UPLOAD_RATE, UPLOAD_CONNECTION_RATE, RATE_MIN_SEND, COMPRESSION_LEVEL, COMPRESSION_BLOCK_SIZE, SHUTDOWN_POLL_INTERVAL
+
+
+class Upload():
+    """
+    State of a download request from another client: the request read so far, then the bytes left to send.
+    Messages are sent from `output`, the raw bytes of a `STREAM` mode range are sent from `file` and
+    the `FILE` messages of a `CHUNK` mode download or the compressed bytes of a range are created from `chunks` as they are sent.
+    `deficit` is the number of bytes the download may still send in the current round, `ready` is set once the socket
+    is writable and cleared when it would block.
+    """
+
+    def __init__(self, sock: socket.socket, addr, connection_rate: int = 0):
+        self.sock = sock
+        self.addr = addr
+        self.rate_limit = TokenBucket(connection_rate)
+        self.deficit = 0
+        self.ready = False
+        self.reader = FrameReader(sock, BUFFER_SIZE)
+        self.body = None
+        self.output = memoryview(b'')
+        self.file = None
+        self.offset = 0
+        self.remaining = 0
+        self.chunks = None
+
+    def peer(self) -> str:
+        """Name the downloading client is registered with if it sent it, otherwise its address and port."""
+        name = self.body.get('NAME') if self.body is not None else None
+        return name if (isinstance(name, str) and name) else '{}:{}'.format(self.addr[0], self.addr[1])
+
+    def close(self) -> None:
+        if (self.file is not None):
+            self.file.close()
+        self.sock.close()
+
+
+class UploadServer():
+    """
+    Answers the download requests of other clients on a single thread, multiplexing all connections with a selector.
+    At most `max_uploads` downloads are sent at the same time, the requests received past them wait in a queue of
+    `queue_size` requests and are refused once it is full.
+
+    The downloads being sent share the upload in rounds with deficit round robin: each round a download may send
+    `quantum` more bytes than it did not send yet, so every download gets the same share whatever the size of its messages.
+    The bytes sent are limited to `rate` bytes per second over all downloads and to `connection_rate` bytes per second
+    on each connection with token buckets, a connection over a limit stops being polled until enough tokens are added.
+    The limits and the quantum can be changed while the server is running with `configure`.
+    `STREAM` mode ranges are compressed at `compression_level` with one of the codecs accepted by the downloading client.
+    """
+
+    def __init__(self, listen_socket: socket.socket, file_index, print_log, backlog: int = UPLOAD_BACKLOG,
+                 max_uploads: int = MAX_UPLOADS, queue_size: int = UPLOAD_QUEUE_SIZE, rate: int = UPLOAD_RATE,
+                 connection_rate: int = UPLOAD_CONNECTION_RATE, quantum: int = UPLOAD_QUANTUM, compression_level: int = COMPRESSION_LEVEL):
+        self.listen_socket = listen_socket
+        self.file_index = file_index
+        self.print_log = print_log
+        self.backlog = backlog
+        self.max_uploads = max_uploads
+        self.queue_size = queue_size
+        self.rate_limit = TokenBucket(rate)
+        self.connection_rate = connection_rate
+        self.quantum = quantum
+        self.compression_level = compression_level
+        self.selector = selectors.DefaultSelector()
+        self.running = threading.Event()
+        self.uploads = deque() # Uploads being sent, in the order of the next round
+        self.throttled = {} # Uploads over a rate limit -> time they can send again
+        self.queue = deque() # Uploads waiting for one being sent to complete
+        self.use_sendfile = hasattr(os, 'sendfile')
+        self.stats_lock = threading.Lock()
+        self.bytes_sent = Counter() # Peer -> bytes sent to it, see `Upload.peer`
+
+    def serve_forever(self) -> None:
+        """Accept connections and answer their requests until `stop` is called."""
+        self.listen_socket.listen(self.backlog)
+        self.listen_socket.setblocking(False)
+        self.selector.register(self.listen_socket, selectors.EVENT_READ)
+        self.running.set()
+
+        timeout = SHUTDOWN_POLL_INTERVAL
+        while (self.running.is_set()):
+            for key, events in self.selector.select(timeout):
+                if (key.data is None):
+                    self.accept()
+                elif (key.data.body is None):
+                    self.read_request(key.data)
+                elif (events & selectors.EVENT_WRITE):
+                    key.data.ready = True
+                else:
+                    self.check_closed(key.data)
+
+            self.resume_throttled()
+            timeout = self.schedule()
+
+        for key in list(self.selector.get_map().values()):
+            if (key.data is not None):
+                key.data.close()
+        for upload in self.queue:
+            upload.close()
+        self.selector.close()
+
+    def stop(self) -> None:
+        self.running.clear()
+
+    def configure(self, rate: int = None, connection_rate: int = None, quantum: int = None) -> None:
+        """Change the rate limits in bytes per second (0 for no limit) or the quantum of the downloads being sent and the next ones."""
+        if (rate is not None):
+            self.rate_limit.configure(rate)
+        if (connection_rate is not None):
+            self.connection_rate = connection_rate # Applied to each connection the next time it sends
+        if (quantum is not None):
+            self.quantum = quantum
+
+    def stats(self) -> dict:
+        """Returns the bytes sent to each peer and the number of downloads being sent and waiting."""
+        with self.stats_lock:
+            bytes_sent = dict(self.bytes_sent)
+        return {'BYTES_SENT': bytes_sent, 'UPLOADS': len(self.uploads), 'QUEUED': len(self.queue)}
+
+    def accept(self) -> None:
+        try:
+            client_socket, addr = self.listen_socket.accept()
+        except (BlockingIOError, ConnectionError):
+            return
+
+        self.print_log('New connection from {}:{}'.format(addr[0], addr[1]))
+        client_socket.setblocking(False)
+        self.selector.register(client_socket, selectors.EVENT_READ, Upload(client_socket, addr, self.connection_rate))
+
+    def read_request(self, upload: Upload) -> None:
+        """Read the download request once it is received, then send its download or queue it."""
+        try:
+            request = upload.reader.read_message()
+        except BlockingIOError:
+            return # Rest of the request not received yet
+        except (OSError, ValueError) as err:
+            self.print_log('ERROR: {}'.format(err))
+            self.selector.unregister(upload.sock)
+            upload.close()
+            return
+
+        upload.body = request.body
+        self.print_log('Client Request\nHeader: {}\nBody: {}\n'.format(request.headers, request.body))
+        self.selector.unregister(upload.sock)
+
+        if (len(self.uploads) < self.max_uploads):
+            self.start(upload)
+        elif (len(self.queue) < self.queue_size):
+            self.print_log('Download of {} queued, {} downloads waiting'.format(upload.body.get('FILE_NAME'), len(self.queue) + 1))
+            self.queue.append(upload)
+        else:
+            self.print_log('Download of {} refused, too many downloads waiting'.format(upload.body.get('FILE_NAME')))
+            self.refuse(upload)
+
+    def refuse(self, upload: Upload) -> None:
+        payload = {
+            'STATUS': 'DOWNLOAD-ERROR',
+            'RQ#': upload.body.get('RQ#'),
+            'REASON': 'Too many downloads, try again later'
+        }
+        try:
+            upload.sock.send(msg_lib.create_response(payload, 503))
+        except OSError:
+            pass # Best effort, the connection is closed anyway
+        upload.close()
+
+    def start(self, upload: Upload) -> None:
+        """Prepare the response to a download request and start sending it."""
+        self.uploads.append(upload)
+        try:
+            if (upload.body.get('MODE') == 'STREAM'):
+                self.prepare_stream(upload)
+            else:
+                self.prepare_chunks(upload)
+
+        except Exception as err:
+            self.prepare_error(upload, err)
+
+        self.selector.register(upload.sock, selectors.EVENT_WRITE, upload)
+
+    def prepare_stream(self, upload: Upload) -> None:
+        """
+        Prepare a `FILE-STREAM` response announcing the size of the file and the range sent, followed by the raw bytes of the range.
+        The range starts at `OFFSET` and is `LENGTH` bytes long, by default the whole file. The file is sent with `sendfile`,
+        copied by the kernel from the page cache to the socket without being read by the client.
+        If `HASHES` is requested the hash of the file and of each of its chunks are sent in the response, once the file index has them.
+        If the client accepts compressed `ENCODINGS`, the range is compressed as it is sent instead and the codec is sent as `ENCODING`.
+        """
+        body = upload.body
+        file_name = body['FILE_NAME']
+        path = os.path.join(PUBLIC_FOLDER, file_name)
+        self.print_log('Streaming file from {}'.format(path))
+
+        upload.file = open(path, 'rb')
+        size = os.fstat(upload.file.fileno()).st_size
+        offset = body.get('OFFSET', 0)
+        if (offset < 0 or offset > size):
+            raise ValueError('Offset {} is outside of the file of {} bytes'.format(offset, size))
+        length = size - offset
+        if (body.get('LENGTH') is not None):
+            length = max(0, min(body['LENGTH'], length))
+
+        codec = choose_codec(file_name, body.get('ENCODINGS', []), self.compression_level)
+        if (codec != 'none' and length > 0):
+            upload.file.seek(offset)
+            if (not is_compressible(upload.file.read(min(COMPRESSION_BLOCK_SIZE, length)))): # Content already compressed
+                codec = 'none'
+        payload = {
+            'RQ#': body['RQ#'],
+            'FILE_NAME': file_name,
+            'SIZE': size,
+            'OFFSET': offset,
+            'LENGTH': length,
+            'ENCODING': codec
+        }
+        entry = self.file_index.get_cached(file_name) if body.get('HASHES') else None # Not hashed on this thread, sent without hashes until it is
+        if (entry is not None and entry['SIZE'] == size):
+            payload['HASH'] = entry['HASH']
+            payload['CHUNK_HASHES'] = entry['CHUNK_HASHES']
+
+        upload.output = memoryview(msg_lib.create_request('FILE-STREAM', payload))
+        upload.offset = offset
+        if (codec == 'none'):
+            upload.remaining = length
+        else:
+            upload.chunks = self.compressed_blocks(upload, create_compressor(codec, self.compression_level), length)
+
+    def compressed_blocks(self, upload: Upload, compressor, length: int):
+        """Compress the range in blocks of `COMPRESSION_BLOCK_SIZE` bytes as they are sent, the compressor holds back what it does not output yet."""
+        upload.file.seek(upload.offset)
+        while (length > 0):
+            block = upload.file.read(min(COMPRESSION_BLOCK_SIZE, length))
+            if (not block):
+                raise EOFError('File shrank with {} bytes left to send'.format(length))
+            length -= len(block)
+            yield compressor.compress(block)
+        yield compressor.flush()
+
+    def prepare_chunks(self, upload: Upload) -> None:
+        """
+        Prepare the `FILE` messages of chunks of 200 characters of the file, created as they are sent until the end of file
+        is reached. A special `FILE-END` message is sent to identify the end of file is reached.
+        """
+        file_name = upload.body['FILE_NAME']
+        path = os.path.join(PUBLIC_FOLDER, file_name)
+        self.print_log('Reading file from {}'.format(path))
+
+        upload.file = open(path, 'r')
+        upload.chunks = self.chunk_messages(upload)
+
+    def chunk_messages(self, upload: Upload):
+        chunk_num = 0
+        while (True):
+            chunk = upload.file.read(200)
+
+            payload = {
+                'RQ#': upload.body['RQ#'],
+                'FILE_NAME': upload.body['FILE_NAME'],
+                'CHUNK#': chunk_num,
+                'TEXT': chunk
+            }
+
+            if (len(chunk) < 200 or not chunk): # Check for EOF
+                self.print_log('Sending final chunk # {}'.format(chunk_num))
+                yield msg_lib.create_request('FILE-END', payload)
+                return
+
+            self.print_log('Sending chunk # {}'.format(chunk_num))
+            yield msg_lib.create_request('FILE', payload)
+            chunk_num += 1
+
+    def prepare_error(self, upload: Upload, err: Exception) -> None:
+        """Replace what is left to send with a `DOWNLOAD-ERROR` response."""
+        self.print_log('Download Error\nReason: {}'.format(err))
+        payload = {
+            'STATUS': 'DOWNLOAD-ERROR',
+            'RQ#': upload.body.get('RQ#'),
+            'REASON': str(err)
+        }
+        upload.output = memoryview(msg_lib.create_response(payload, 500))
+        upload.remaining = 0
+        upload.chunks = None
+
+    def schedule(self) -> float:
+        """
+        Run a round of deficit round robin over the downloads whose socket is writable.
+        Returns the seconds to wait for new events before the next round.
+        """
+        first_throttled = None
+        for upload in list(self.uploads):
+            if (upload.ready and upload not in self.throttled):
+                if (not self.send(upload) and first_throttled is None):
+                    first_throttled = upload
+
+        # Start the next round with the first download stopped by the global limit, or else with the next download
+        if (first_throttled in self.uploads):
+            self.uploads.rotate(-self.uploads.index(first_throttled))
+        else:
+            self.uploads.rotate(-1)
+
+        if (any(upload.ready and upload not in self.throttled for upload in self.uploads)):
+            return 0
+        if (self.throttled):
+            return max(0, min(min(self.throttled.values()) - time.monotonic(), SHUTDOWN_POLL_INTERVAL))
+        return SHUTDOWN_POLL_INTERVAL
+
+    def send(self, upload: Upload) -> bool:
+        """
+        Send the bytes of a download allowed by its deficit and the rate limits, until the socket would block.
+        Returns False if the download could not send because of the global rate limit.
+        """
+        if (upload.rate_limit.rate != self.connection_rate):
+            upload.rate_limit.configure(self.connection_rate)
+
+        tokens = min(self.rate_limit.available(), upload.rate_limit.available())
+        if (tokens < RATE_MIN_SEND):
+            if (self.rate_limit.available() < RATE_MIN_SEND):
+                # Every download waits, the ones after this one in the round must not send before it once tokens are added
+                delay = self.rate_limit.delay(RATE_MIN_SEND)
+                for waiting in self.uploads:
+                    self.throttle(waiting, delay)
+                return False
+            self.throttle(upload, upload.rate_limit.delay(RATE_MIN_SEND))
+            return True
+
+        upload.deficit += self.quantum
+        budget = int(min(upload.deficit, tokens))
+        sent = 0
+        try:
+            while (sent < budget):
+                if (upload.output):
+                    size = upload.sock.send(upload.output[:budget - sent])
+                    upload.output = upload.output[size:]
+                elif (upload.remaining > 0):
+                    size = self.send_file(upload, budget - sent)
+                elif (upload.chunks is not None):
+                    try:
+                        upload.output = memoryview(next(upload.chunks))
+                    except StopIteration:
+                        upload.chunks = None
+                    except Exception as err:
+                        if (upload.body.get('MODE') == 'STREAM'):
+                            # The stream has started, an error message would be read as bytes of the file: the connection is closed instead so the download resumes
+                            raise EOFError(str(err)) from err
+                        self.prepare_error(upload, err)
+                    continue
+                else:
+                    break
+                sent += size
+
+        except BlockingIOError:
+            upload.ready = False # Socket buffer full, continue once it is writable
+        except (OSError, EOFError) as err:
+            self.print_log('ERROR: {}'.format(err))
+            self.count_sent(upload, sent)
+            self.finish(upload)
+            return True
+
+        self.count_sent(upload, sent)
+        upload.deficit = min(upload.deficit - sent, self.quantum) # Bytes held back by a rate limit are not saved up
+        if (not upload.ready):
+            upload.deficit = 0 # Nothing more can be sent this round, the deficit is not kept
+
+        if (not upload.output and upload.remaining == 0 and upload.chunks is None):
+            with self.stats_lock:
+                total = self.bytes_sent[upload.peer()]
+            self.print_log('Download complete, {} bytes sent to {} in total'.format(total, upload.peer()))
+            self.finish(upload)
+        return True
+
+    def count_sent(self, upload: Upload, size: int) -> None:
+        self.rate_limit.consume(size)
+        upload.rate_limit.consume(size)
+        with self.stats_lock:
+            self.bytes_sent[upload.peer()] += size
+
+    def throttle(self, upload: Upload, delay: float) -> None:
+        """Stop polling a download for writing until it can send again, its closing is still noticed."""
+        resume_time = time.monotonic() + delay
+        if (upload in self.throttled):
+            self.throttled[upload] = max(self.throttled[upload], resume_time)
+            return
+        self.throttled[upload] = resume_time
+        self.selector.modify(upload.sock, selectors.EVENT_READ, upload)
+
+    def resume_throttled(self) -> None:
+        now = time.monotonic()
+        for upload, resume_time in list(self.throttled.items()):
+            if (resume_time <= now):
+                del self.throttled[upload]
+                self.selector.modify(upload.sock, selectors.EVENT_WRITE, upload)
+
+    def check_closed(self, upload: Upload) -> None:
+        """Finish a throttled download if the other client closed the connection, it does not send anything after its request."""
+        try:
+            if (upload.sock.recv(BUFFER_SIZE)):
+                return
+        except BlockingIOError:
+            return
+        except OSError:
+            pass
+        self.print_log('ERROR: Connection closed by {}:{}'.format(upload.addr[0], upload.addr[1]))
+        self.finish(upload)
+
+    def send_file(self, upload: Upload, max_size: int) -> int:
+        """
+        Send raw bytes of the file range left with `sendfile`. If `sendfile` is not available,
+        the bytes are read to the output instead and sent from it next. Returns the number of bytes
+        written to the socket, 0 if they were read to the output, they are counted once sent from it.
+        """
+        size = min(upload.remaining, max_size)
+        if (self.use_sendfile):
+            size = os.sendfile(upload.sock.fileno(), upload.file.fileno(), upload.offset, size)
+            sent = size
+        else:
+            upload.file.seek(upload.offset)
+            upload.output = memoryview(upload.file.read(size))
+            size = len(upload.output)
+            sent = 0
+
+        if (size == 0):
+            raise EOFError('File shrank with {} bytes left to send'.format(upload.remaining))
+        upload.offset += size
+        upload.remaining -= size
+        return sent
+
+    def finish(self, upload: Upload) -> None:
+        """Close a download and start the next downloads queued."""
+        self.selector.unregister(upload.sock)
+        self.uploads.remove(upload)
+        self.throttled.pop(upload, None)
+        upload.close()
+
+        while (self.queue and len(self.uploads) < self.max_uploads):
+            self.start(self.queue.popleft())